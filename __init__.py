@@ -2,8 +2,16 @@
 
 from . import models
 from . import controllers
+from . import wizards
+from . import cli
 
 from odoo.addons.payment import setup_provider, reset_payment_provider
+from odoo.addons.smobilpay_odoo_gateway import utils
+
+
+def pre_init_hook(cr):
+    # Installed before the tables, so that their trigram indexes are created
+    utils.install_pg_trgm(cr)
 
 
 def post_init_hook(cr, registry):
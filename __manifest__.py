@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'SmobilPay Mobile Money Gateway',
-    'version': '2.1.5',
+    'version': '2.1.6',
     'category': 'Accounting/Payment Providers',
     'summary': 'Accept Mobile Money payments in Cameroon through SmobilPay',
     'description': """
@@ -27,23 +27,40 @@ Key Features:
     'author': 'Maviance PLC',
     'website': 'https://maviance.cm',
     'license': 'GPL-3',
-    'depends': ['payment', 'website_sale'],
+    'depends': ['bus', 'payment', 'website_sale'],
     'data': [
         'security/ir.model.access.csv',
+        'views/smobilpay_menus.xml',
         'views/payment_provider_views.xml',
         'views/payment_smobilpay_templates.xml',
+        'views/smobilpay_dead_letter_views.xml',
+        'views/smobilpay_outbox_views.xml',
+        'views/smobilpay_profile_trace_views.xml',
+        'wizards/smobilpay_transaction_export_views.xml',
         'data/payment_provider_data.xml',
+        'data/ir_cron_data.xml',
     ],
     'assets': {
+        'web.assets_backend': [
+            'smobilpay_odoo_gateway/static/src/css/ops_dashboard.css',
+            'smobilpay_odoo_gateway/static/src/js/ops_dashboard.js',
+            'smobilpay_odoo_gateway/static/src/xml/ops_dashboard.xml',
+        ],
         'web.assets_frontend': [
+            'smobilpay_odoo_gateway/static/src/js/payment_form_loader.js',
+        ],
+        # Lazily loaded by payment_form_loader.js on SmobilPay pages only
+        'smobilpay_odoo_gateway.assets_payment_form': [
             'smobilpay_odoo_gateway/static/src/css/payment_form.css',
             'smobilpay_odoo_gateway/static/src/js/payment_form.js',
+            'smobilpay_odoo_gateway/static/src/js/payment_form_boot.js',
         ],
     },
     'images': ['static/description/icon.png'],
     'installable': True,
     'application': False,
     'auto_install': False,
+    'pre_init_hook': 'pre_init_hook',
     'post_init_hook': 'post_init_hook',
     'uninstall_hook': 'uninstall_hook',
 }
\ No newline at end of file
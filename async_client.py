@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import threading
+
+from odoo import _
+from odoo.exceptions import UserError
+
+from odoo.addons.smobilpay_odoo_gateway import const, rate_limit, utils
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+_logger = logging.getLogger(__name__)
+
+
+class SmobilpayAsyncClient:
+    """asyncio client for the SmobilPay API, meant for batch jobs
+
+    All calls made through one client share a semaphore bounding the number of
+    concurrent requests. Authentication and errors behave as in
+    `payment.provider._smobilpay_make_request`: the access token and circuit
+    breaker are shared with the synchronous calls of the same provider, and
+    failures raise `UserError`.
+
+    Calls go through the `background` lane of the cluster-wide rate limiter,
+    so they never take the tokens reserved for checkout calls.
+
+    The provider credentials are read when the client is built, so that the
+    coroutines never touch the ORM.
+    """
+
+    def __init__(self, provider, concurrency=const.ASYNC_CONCURRENCY_LIMIT):
+        if aiohttp is None:
+            raise UserError(_("The aiohttp Python library is required for SmobilPay batch jobs"))
+        provider.ensure_one()
+        self.provider_id = provider.id
+        self.api_url = provider._smobilpay_get_api_url()
+        self.consumer_key = provider.smobilpay_consumer_key
+        self.consumer_secret = provider.smobilpay_consumer_secret
+        self.state = utils.get_provider_state(provider)
+        self.limiter = rate_limit.RateLimiter(provider)
+        self.concurrency = concurrency
+        self._semaphore = None
+        self._token_lock = None
+        self._session = None
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._token_lock = asyncio.Lock()
+        self._session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=30),
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+
+    # === AUTHENTICATION === #
+
+    async def get_access_token(self):
+        """Return the provider's access token, fetching a new one if needed"""
+        token = self.state.get_token()
+        if token:
+            return token
+
+        async with self._token_lock:
+            token = self.state.get_token()
+            if token:
+                return token
+
+            auth_data = {
+                'grant_type': 'client_credentials',
+                'client_id': self.consumer_key,
+                'client_secret': self.consumer_secret,
+            }
+            try:
+                async with self._semaphore:
+                    async with self._session.post(f"{self.api_url}/oauth/token", data=auth_data) as response:
+                        response.raise_for_status()
+                        token_data = await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self._record_error(e)
+                _logger.error("Failed to get SmobilPay access token for provider %s: %s", self.provider_id, str(e))
+                return False
+
+            token = token_data.get('access_token')
+            if token:
+                self.state.set_token(token, token_data.get('expires_in'))
+            return token
+
+    # === REQUESTS === #
+
+    async def make_request(self, endpoint, data=None, method='GET'):
+        """Make authenticated request to SmobilPay API"""
+        if not self.state.allow_request():
+            raise UserError(_(
+                "SmobilPay API is temporarily unavailable for provider %s, please try again later"
+            ) % self.provider_id)
+
+        token = await self.get_access_token()
+        if not token:
+            raise UserError(_("Failed to authenticate with SmobilPay API"))
+
+        try:
+            status, payload = await self._send(endpoint, token, data, method)
+            if status == 401:
+                # The cached token was revoked or expired early: renew it once
+                self.state.clear_token()
+                token = await self.get_access_token()
+                if not token:
+                    raise UserError(_("Failed to authenticate with SmobilPay API"))
+                status, payload = await self._send(endpoint, token, data, method)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._record_error(e)
+            _logger.error("SmobilPay API request failed for provider %s: %s", self.provider_id, str(e))
+            raise UserError(_("Communication with SmobilPay API failed: %s") % str(e))
+
+        self.state.record_success()
+        return payload
+
+    async def _send(self, endpoint, token, data, method):
+        headers = {
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+        }
+        url = f"{self.api_url}{endpoint}"
+        kwargs = {'json': data} if method.upper() == 'POST' else {'params': data}
+        for attempt in range(const.RATE_LIMIT_MAX_RETRIES + 1):
+            await self._acquire()
+            async with self._semaphore:
+                async with self._session.request(method.upper(), url, headers=headers, **kwargs) as response:
+                    if response.status == 429 and attempt < const.RATE_LIMIT_MAX_RETRIES:
+                        retry_after = rate_limit.parse_retry_after(response.headers.get('Retry-After'))
+                        await asyncio.to_thread(self.limiter.block, retry_after)
+                        continue
+                    if response.status == 401:
+                        return response.status, None
+                    response.raise_for_status()
+                    return response.status, await response.json()
+
+    async def _acquire(self):
+        """Wait for a token of the background lane of the rate limiter"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + const.RATE_LIMIT_LANE_TIMEOUT['background']
+        while True:
+            wait = await asyncio.to_thread(self.limiter.try_acquire, 'background')
+            if not wait:
+                return
+            if loop.time() + wait > deadline:
+                raise UserError(_("SmobilPay API rate limit reached, please try again in a moment"))
+            await asyncio.sleep(min(wait, 1))
+
+    def _record_error(self, error):
+        # Client errors are the caller's fault and say nothing about the API health
+        status = getattr(error, 'status', None)
+        if status is None or status >= 500:
+            self.state.record_failure(str(error))
+
+    # === ENDPOINTS === #
+
+    async def create_order(self, payment_data):
+        return await self.make_request('/api/order/create', payment_data, 'POST')
+
+    async def get_order_status(self, merchant_reference):
+        return await self.make_request('/api/order/status', {'merchantReference': merchant_reference})
+
+    async def register_callback_url(self, callback_url):
+        return await self.make_request('/api/callbackurl', {'callbackUrl': callback_url}, 'POST')
+
+    async def gather(self, calls):
+        """Run `(endpoint, data, method)` calls concurrently
+
+        :return: The responses, in the order of `calls`; failed calls are
+                 returned as their exception instead of being raised
+        :rtype: list
+        """
+        return await asyncio.gather(
+            *(self.make_request(*call) for call in calls), return_exceptions=True
+        )
+
+
+def run_sync(provider, handler, concurrency=const.ASYNC_CONCURRENCY_LIMIT):
+    """Run `handler(client)` to completion from synchronous code such as a cron
+
+    :param recordset provider: The provider, as a `payment.provider` record
+    :param handler: Coroutine function receiving a `SmobilpayAsyncClient`
+    :return: The result of the coroutine
+    """
+    client = SmobilpayAsyncClient(provider, concurrency=concurrency)
+
+    async def _run():
+        async with client:
+            return await handler(client)
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_run())
+
+    # An event loop already runs in this thread: use a dedicated one
+    result = {}
+
+    def _target():
+        try:
+            result['value'] = asyncio.run(_run())
+        except Exception as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=_target, name='smobilpay.async_client')
+    thread.start()
+    thread.join()
+    if 'error' in result:
+        raise result['error']
+    return result['value']
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from odoo.cli import Command
+
+from odoo.addons.smobilpay_odoo_gateway import utils
+
+SYNTHETIC_STATUSES = ('IN_PROGRESS', 'CONFIRMED', 'FAILED', 'CANCELLED')
+SYNTHETIC_METHODS = ('MTN_CM', 'ORANGE_CM', 'EXPRESS_UNION', 'SMOBILPAY_CASH')
+
+
+class SmobilpayReplay(Command):
+    """Replay or synthesise SmobilPay notifications against an Odoo server"""
+
+    name = 'smobilpay_replay'
+
+    def run(self, cmdargs):
+        parser = argparse.ArgumentParser(
+            prog=f'{os.path.basename(sys.argv[0])} {self.name}',
+            description=self.__doc__,
+        )
+        parser.add_argument('--url', required=True, help="Base URL of the Odoo server, e.g. http://localhost:8069")
+        parser.add_argument(
+            '--log', help="JSON lines file of recorded notifications. Each line is either a payload, "
+                          "or an object with `route` (webhook or callback) and `payload` keys."
+        )
+        parser.add_argument('--synthesize', type=int, default=0, help="Number of notifications to generate")
+        parser.add_argument(
+            '--reference', action='append', default=[],
+            help="Merchant reference used by synthetic notifications (repeatable)"
+        )
+        parser.add_argument(
+            '--route', choices=('webhook', 'callback'), default='webhook',
+            help="Route of the notifications that do not specify one"
+        )
+        parser.add_argument(
+            '--secret', default=os.environ.get('SMOBILPAY_WEBHOOK_SECRET'),
+            help="Webhook secret used to sign webhook payloads (default: $SMOBILPAY_WEBHOOK_SECRET)"
+        )
+        parser.add_argument('--rate', type=float, default=10, help="Notifications sent per second (0: unlimited)")
+        parser.add_argument('--concurrency', type=int, default=10, help="Number of requests in flight")
+        parser.add_argument('--timeout', type=float, default=30, help="Timeout of each request, in seconds")
+        args = parser.parse_args(cmdargs)
+
+        if not args.log and not args.synthesize:
+            parser.error("one of --log or --synthesize is required")
+
+        notifications = list(self._read_log(args.log, args.route)) if args.log else []
+        if args.synthesize:
+            notifications += self._synthesize(args.synthesize, args.reference, args.route)
+
+        report = self._replay(notifications, args)
+        self._print_report(report)
+
+    # === INPUT === #
+
+    def _read_log(self, path, default_route):
+        with open(path, encoding='utf-8') as log_file:
+            for line in log_file:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                if 'payload' in entry:
+                    yield entry.get('route', default_route), entry['payload']
+                else:
+                    yield default_route, entry
+
+    def _synthesize(self, count, references, route):
+        references = itertools.cycle(references or [None])
+        statuses = itertools.cycle(SYNTHETIC_STATUSES)
+        methods = itertools.cycle(SYNTHETIC_METHODS)
+        notifications = []
+        for _i in range(count):
+            notifications.append((route, {
+                'merchantReference': next(references) or str(uuid.uuid4()),
+                'paymentId': str(uuid.uuid4()),
+                'status': next(statuses),
+                'statusMessage': "Synthetic notification",
+                'paymentMethod': next(methods),
+                'phoneNumber': '677123456',
+            }))
+        return notifications
+
+    # === REPLAY === #
+
+    def _replay(self, notifications, args):
+        sessions = threading.local()
+        base_url = args.url.rstrip('/')
+        interval = 1 / args.rate if args.rate > 0 else 0
+        start = time.monotonic()
+
+        def send(index, route, payload):
+            # Hold the request until its slot in the schedule
+            delay = start + index * interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if not hasattr(sessions, 'session'):
+                sessions.session = requests.Session()
+
+            sent_at = time.perf_counter()
+            try:
+                ok = self._send(sessions.session, base_url, route, payload, args)
+            except requests.RequestException:
+                ok = False
+            return ok, time.perf_counter() - sent_at
+
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            futures = [
+                executor.submit(send, index, route, payload)
+                for index, (route, payload) in enumerate(notifications)
+            ]
+            results = [future.result() for future in futures]
+
+        return {
+            'elapsed': time.monotonic() - start,
+            'results': results,
+        }
+
+    def _send(self, session, base_url, route, payload, args):
+        if route == 'callback':
+            reference = payload.get('merchantReference') or payload.get('reference')
+            response = session.post(
+                f'{base_url}/payment/smobilpay/callback/{reference}',
+                data=payload, timeout=args.timeout, allow_redirects=False,
+            )
+            # The callback answers with a redirection, to the cart on errors
+            return response.status_code < 400 and 'payment_error' not in response.headers.get('Location', '')
+
+        body = json.dumps(payload)
+        headers = {'Content-Type': 'application/json'}
+        if args.secret:
+            headers['X-SmobilPay-Signature'] = utils.sign_webhook_payload(body, args.secret)
+        response = session.post(
+            f'{base_url}/payment/smobilpay/webhook', data=body, headers=headers, timeout=args.timeout,
+        )
+        if response.status_code >= 400:
+            return False
+        result = response.json().get('result') or {}
+        return result.get('status') == 'success'
+
+    # === REPORT === #
+
+    def _print_report(self, report):
+        results = report['results']
+        total = len(results)
+        errors = sum(1 for ok, _latency in results if not ok)
+        latencies = sorted(latency for _ok, latency in results)
+
+        def percentile(p):
+            if not latencies:
+                return 0
+            return latencies[min(int(p / 100 * len(latencies)), len(latencies) - 1)] * 1000
+
+        print(f"Notifications sent : {total}")
+        print(f"Elapsed            : {report['elapsed']:.2f} s")
+        print(f"Throughput         : {total / report['elapsed'] if report['elapsed'] else 0:.1f} notifications/s")
+        print(f"Errors             : {errors} ({errors / total * 100 if total else 0:.1f} %)")
+        print("Latency (ms)       : p50 {:.1f} | p90 {:.1f} | p99 {:.1f} | max {:.1f}".format(
+            percentile(50), percentile(90), percentile(99), latencies[-1] * 1000 if latencies else 0,
+        ))
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+import re
+
+# Currencies SmobilPay can process, XAF being the primary one
+SUPPORTED_CURRENCIES = ('XAF', 'EUR', 'USD')
+
+# Mobile money operators accepted by the inline form, keyed by the value of
+# `payment.transaction.smobilpay_payment_method`.
+PAYMENT_METHODS = ('mtn_cm', 'orange_cm', 'express_union', 'smobilpay_cash')
+
+# Characters customers commonly type inside phone numbers
+PHONE_STRIP_PATTERN = re.compile(r'[\s\-\(\)]')
+
+# Cameroon country calling code, prefixed to stored phone numbers (E.164)
+PHONE_COUNTRY_CODE = '237'
+PHONE_E164_PREFIX = f'+{PHONE_COUNTRY_CODE}'
+
+# Phone numbers whose normalised form is kept by each worker
+PHONE_CACHE_SIZE = 4096
+
+# Operator owning each local number prefix, the longest prefixes being checked first
+PHONE_OPERATOR_PREFIXES = {
+    '650': 'mtn_cm', '651': 'mtn_cm', '652': 'mtn_cm', '653': 'mtn_cm', '654': 'mtn_cm',
+    '680': 'mtn_cm', '681': 'mtn_cm', '682': 'mtn_cm', '683': 'mtn_cm', '684': 'mtn_cm',
+    '655': 'orange_cm', '656': 'orange_cm', '657': 'orange_cm', '658': 'orange_cm', '659': 'orange_cm',
+    '685': 'orange_cm', '686': 'orange_cm', '687': 'orange_cm', '688': 'orange_cm', '689': 'orange_cm',
+    '67': 'mtn_cm',
+    '69': 'orange_cm',
+}
+
+# Mapping of SmobilPay order statuses to Odoo transaction states
+STATUS_MAPPING = {
+    'CREATED': 'pending',
+    'INITIALISED': 'pending',
+    'IN_PROGRESS': 'pending',
+    'CONFIRMED': 'done',
+    'FAILED': 'error',
+    'CANCELED': 'cancel',
+    'CANCELLED': 'cancel',
+}
+
+# Mapping of SmobilPay payment methods to `smobilpay_payment_method` values
+PAYMENT_METHOD_MAPPING = {
+    'MTN_CM': 'mtn_cm',
+    'ORANGE_CM': 'orange_cm',
+    'EXPRESS_UNION': 'express_union',
+    'SMOBILPAY_CASH': 'smobilpay_cash',
+}
+
+# Notification fields read by `SmobilpayNotification.parse`, all strings
+NOTIFICATION_FIELDS = (
+    'merchantReference', 'reference', 'paymentId', 'status', 'statusMessage', 'phoneNumber',
+    'paymentMethod',
+)
+
+# Transaction states from which a payment request may still be created
+PAYMENT_REQUEST_STATES = ('draft', 'pending')
+
+# Default lifetime (minutes) of a cached order-create response
+IDEMPOTENCY_TTL_MINUTES = 30
+
+# Seconds subtracted from the token lifetime so it is renewed before expiry
+TOKEN_EXPIRY_MARGIN = 60
+
+# Token lifetime assumed when the OAuth response does not provide one
+DEFAULT_TOKEN_LIFETIME = 3600
+
+# Consecutive upstream failures after which a provider's circuit opens
+CIRCUIT_FAILURE_THRESHOLD = 5
+
+# Seconds an open circuit rejects calls before letting a probe through
+CIRCUIT_RESET_TIMEOUT = 60
+
+# Pooled HTTP connections kept per provider
+CONNECTION_POOL_SIZE = 10
+
+# Seconds the warm-up thread waits for the registry to finish loading
+WARM_UP_REGISTRY_TIMEOUT = 60
+
+# Concurrent requests allowed by default to the asyncio client
+ASYNC_CONCURRENCY_LIMIT = 20
+
+# Default sustained rate (requests per second) and burst allowed per provider
+RATE_LIMIT_DEFAULT_RATE = 10.0
+RATE_LIMIT_DEFAULT_BURST = 20
+
+# Share of the bucket each lane must leave untouched. Background jobs cannot
+# take the last half of the tokens, which stay available to checkout calls.
+RATE_LIMIT_LANE_RESERVE = {
+    'checkout': 0.0,
+    'background': 0.5,
+}
+
+# Longest time (seconds) a call of each lane waits for a token
+RATE_LIMIT_LANE_TIMEOUT = {
+    'checkout': 5,
+    'background': 300,
+}
+
+# Times a call is retried after an HTTP 429 response
+RATE_LIMIT_MAX_RETRIES = 2
+
+# Wait (seconds) applied after a 429 response without a usable Retry-After
+RATE_LIMIT_DEFAULT_RETRY_AFTER = 1
+
+# System parameters controlling the request profiler
+PROFILING_ENABLED_PARAM = 'smobilpay.profiling_enabled'
+PROFILING_SAMPLE_RATE_PARAM = 'smobilpay.profiling_sample_rate'
+PROFILING_KEEP_PARAM = 'smobilpay.profiling_keep'
+
+# Defaults of the request profiler: share of calls sampled, and number of
+# slowest traces kept
+PROFILING_DEFAULT_SAMPLE_RATE = 0.1
+PROFILING_DEFAULT_KEEP = 100
+
+# Seconds the health endpoint serves a response from the worker's memory
+HEALTH_CACHE_TTL = 10
+
+# Seconds after which a health probe result is considered stale
+HEALTH_PROBE_STALE_AFTER = 300
+
+# Transactions read per chunk, and default seconds per run, of the phone number
+# backfill; runs must end well before the `limit_time_real` of cron workers
+# (120 s by default), or the worker is killed before re-triggering the cron
+BACKFILL_BATCH_SIZE = 5000
+BACKFILL_DEFAULT_TIME_LIMIT = 60
+
+# Retry policy of notifications captured in the dead-letter queue: the delay
+# doubles after each attempt, from the base delay up to the maximum one
+DEAD_LETTER_BASE_DELAY = 30
+DEAD_LETTER_MAX_DELAY = 3600
+DEAD_LETTER_MAX_ATTEMPTS = 10
+
+# Dead letters retried per run of the retry cron
+DEAD_LETTER_BATCH_SIZE = 100
+
+# Transactions post-processed together by the batched finalisation cron
+POST_PROCESSING_BATCH_SIZE = 200
+
+# Days after their confirmation during which transactions are still picked up
+# by the batched finalisation cron, as Odoo's own post-processing cron does
+POST_PROCESSING_RETRY_LIMIT_DAYS = 4
+
+# Width (seconds) of the buckets of the velocity counters, and age after which
+# buckets are deleted
+VELOCITY_BUCKET_SIZE = 300
+VELOCITY_RETENTION = 86400
+
+# Default window (minutes) of the velocity limits, which are all disabled by default
+VELOCITY_DEFAULT_WINDOW = 60
+
+# Types of the keys counted by the velocity counters
+VELOCITY_KEY_TYPES = ('phone', 'partner', 'ip')
+
+# Transactions fetched per round trip by the streaming export, and bytes per
+# chunk sent when streaming a generated file
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FILE_CHUNK_SIZE = 65536
+
+# Rows of an XLSX sheet, header included; the export continues on a new sheet
+EXPORT_XLSX_MAX_ROWS = 1048576
+
+# Hours the previous webhook secret keeps being accepted after a rotation
+WEBHOOK_SECRET_GRACE_HOURS = 72
+
+# Seconds between two saves of a worker's webhook signature match counts
+WEBHOOK_MATCH_FLUSH_INTERVAL = 60
+
+# Default age (minutes) after which an order creation queued during an outage
+# is discarded, and queued requests forwarded per run of the drainer
+OUTBOX_DEFAULT_TTL = 60
+OUTBOX_BATCH_SIZE = 50
+
+# Minutes of activity shown by the operations dashboard, and state changes
+# loaded when it is opened
+OPS_DASHBOARD_WINDOW = 15
+OPS_DASHBOARD_SNAPSHOT_LIMIT = 2000
+
+# Relative accuracy of the confirmation latency quantiles, and smallest latency
+# (seconds) told apart
+LATENCY_SKETCH_ACCURACY = 0.01
+LATENCY_SKETCH_MIN_VALUE = 0.1
+
+# Days the hourly latency sketches are kept
+LATENCY_SKETCH_RETENTION_DAYS = 90
+
+# Minutes of confirmations checked against the p95 latency threshold, and
+# confirmations needed before an alert is raised
+LATENCY_ALERT_WINDOW = 60
+LATENCY_ALERT_MIN_COUNT = 20
+
+# Default p95 confirmation latency (seconds) above which an alert is raised
+LATENCY_DEFAULT_P95_THRESHOLD = 120
+
+# Default replica lag (seconds) beyond which reporting queries fall back to the
+# primary, and seconds between two lag measurements by a worker
+REPLICA_DEFAULT_MAX_LAG = 30
+REPLICA_LAG_CHECK_INTERVAL = 10
@@ -3,22 +3,36 @@
 import json
 import logging
 import pprint
+import time
 import werkzeug
+from datetime import datetime, timedelta
+
+import psycopg2
 
 from odoo import http, _
-from odoo.exceptions import ValidationError
+from odoo.exceptions import UserError, ValidationError
 from odoo.http import request
+from odoo.addons.payment.controllers.post_processing import PaymentPostProcessing
+from odoo.addons.smobilpay_odoo_gateway import const, profiling
+from odoo.addons.smobilpay_odoo_gateway.export import TransactionExport
 
 _logger = logging.getLogger(__name__)
 
+# Health responses served from memory, per database: {dbname: (expires_at, body, status)}
+_health_cache = {}
+
 
 class SmobilpayController(http.Controller):
     _callback_url = '/payment/smobilpay/callback'
     _return_url = '/payment/smobilpay/return'
     _webhook_url = '/payment/smobilpay/webhook'
+    _create_url = '/payment/smobilpay/create'
+    _health_url = '/payment/smobilpay/health'
+    _export_url = '/payment/smobilpay/export'
 
     @http.route('/payment/smobilpay/callback/<string:merchant_reference>', 
                 type='http', auth='public', methods=['GET', 'POST'], csrf=False, save_session=False)
+    @profiling.profiled('/payment/smobilpay/callback')
     def smobilpay_callback(self, merchant_reference, **kwargs):
         """Handle payment callback from SmobilPay (similar to WordPress smobilpay-return.php)"""
         _logger.info("SmobilPay callback received for merchant reference: %s", merchant_reference)
@@ -33,19 +47,14 @@ class SmobilpayController(http.Controller):
                 _logger.error("No transaction found for merchant reference: %s", merchant_reference)
                 return request.redirect('/shop/cart')
 
-            # Extract payment data from request (GET or POST)
-            notification_data = dict(request.httprequest.args)
-            if request.httprequest.method == 'POST':
-                notification_data.update(request.httprequest.form.to_dict())
-                
-            # Add merchant reference to notification data
-            notification_data['merchantReference'] = merchant_reference
+            # Payment data from the query string and form, merged by Odoo
+            notification_data = dict(kwargs, merchantReference=merchant_reference)
             
             _logger.info("SmobilPay callback data: %s", pprint.pformat(notification_data))
 
             # Process the notification data
             if notification_data:
-                tx_sudo._handle_notification_data('smobilpay', notification_data)
+                self._handle_notification(tx_sudo, 'callback', notification_data)
             
             # Redirect to appropriate page based on transaction state
             if tx_sudo.state == 'done':
@@ -64,6 +73,7 @@ class SmobilpayController(http.Controller):
 
     @http.route('/payment/smobilpay/return/<string:merchant_reference>',
                 type='http', auth='public', methods=['GET'], csrf=False, save_session=False)
+    @profiling.profiled('/payment/smobilpay/return')
     def smobilpay_return(self, merchant_reference, **kwargs):
         """Handle customer return from SmobilPay payment page"""
         _logger.info("SmobilPay return received for merchant reference: %s", merchant_reference)
@@ -91,7 +101,7 @@ class SmobilpayController(http.Controller):
                 }
                 
                 # Process notification data
-                tx_sudo._handle_notification_data('smobilpay', notification_data)
+                self._handle_notification(tx_sudo, 'return', notification_data)
 
             # Redirect based on transaction state
             return self._redirect_after_payment(tx_sudo)
@@ -101,6 +111,7 @@ class SmobilpayController(http.Controller):
             return request.redirect('/shop/cart?payment_error=1')
 
     @http.route('/payment/smobilpay/webhook', type='json', auth='public', methods=['POST'], csrf=False)
+    @profiling.profiled('/payment/smobilpay/webhook')
     def smobilpay_webhook(self, **kwargs):
         """Handle SmobilPay webhook notifications (asynchronous status updates)"""
         _logger.info("SmobilPay webhook received")
@@ -127,24 +138,151 @@ class SmobilpayController(http.Controller):
                 _logger.error("No transaction found for webhook merchant reference: %s", merchant_reference)
                 return {'status': 'error', 'message': 'Transaction not found'}
 
-            # Verify webhook signature if secret is configured
-            if tx_sudo.provider_id.smobilpay_webhook_secret:
-                if not tx_sudo._smobilpay_verify_webhook_signature(
-                    request.httprequest.data.decode('utf-8'),
-                    signature,
-                    tx_sudo.provider_id.smobilpay_webhook_secret
-                ):
-                    _logger.error("SmobilPay webhook signature verification failed")
-                    return {'status': 'error', 'message': 'Invalid signature'}
-
-            # Process webhook data
-            tx_sudo._handle_notification_data('smobilpay', webhook_data)
+            # Verify webhook signature
+            if not tx_sudo._smobilpay_verify_webhook_signature(
+                request.httprequest.data.decode('utf-8'),
+                signature,
+            ):
+                _logger.error("SmobilPay webhook signature verification failed")
+                return {'status': 'error', 'message': 'Invalid signature'}
+
+            # Process webhook data; failures are queued for retry on our side
+            if not self._handle_notification(tx_sudo, 'webhook', webhook_data):
+                return {'status': 'success', 'message': 'Webhook received'}
             
             return {'status': 'success', 'message': 'Webhook processed successfully'}
             
         except Exception as e:
             _logger.exception("Error processing SmobilPay webhook: %s", str(e))
-            return {'status': 'error', 'message': str(e)}
+            return {'status': 'error', 'message': 'Webhook processing failed'}
+
+    def _handle_notification(self, tx_sudo, route, notification_data):
+        """Process a notification, capturing it in the dead-letter queue on failure
+
+        The processing runs in a savepoint so that a failure (e.g. a lock
+        timeout at peak) leaves the cursor usable to store the notification.
+
+        :return: Whether the notification was processed
+        :rtype: bool
+        """
+        try:
+            with request.env.cr.savepoint():
+                tx_sudo._handle_notification_data('smobilpay', notification_data)
+            return True
+        except Exception as e:
+            _logger.exception("SmobilPay %s processing failed, queued for retry: %s", route, str(e))
+            request.env['smobilpay.dead.letter'].sudo()._smobilpay_capture(
+                route, notification_data, e, tx=tx_sudo
+            )
+            return False
+
+    @http.route('/payment/smobilpay/create', type='http', auth='public', methods=['POST'], csrf=False)
+    @profiling.profiled('/payment/smobilpay/create')
+    def smobilpay_create(self, merchant_reference=None, phone=None, method=None, **kwargs):
+        """Create the SmobilPay payment request for the inline form
+
+        Only the transaction matching the merchant reference is used, so repeated
+        submissions (double-click) return the payment URL of the first one. The
+        transaction must have been created in the customer's session, as the
+        merchant reference alone appears in the return and callback URLs.
+        """
+        start = time.perf_counter()
+        status = 200
+        try:
+            tx_sudo = request.env['payment.transaction'].sudo().search([
+                ('smobilpay_merchant_reference', '=', merchant_reference),
+                ('provider_code', '=', 'smobilpay'),
+            ], limit=1) if merchant_reference else None
+
+            if not tx_sudo or tx_sudo.id not in PaymentPostProcessing.get_monitored_transaction_ids():
+                status = 404
+                return self._json_response({'status': 'error', 'error': _("Transaction not found")}, status)
+            if tx_sudo.state not in const.PAYMENT_REQUEST_STATES:
+                status = 409
+                return self._json_response({'status': 'error', 'error': _("This payment is already processed")}, status)
+
+            try:
+                clean_phone = tx_sudo._smobilpay_validate_phone(phone, method)
+            except ValidationError as e:
+                status = 400
+                return self._json_response({'status': 'error', 'error': str(e)}, status)
+
+            # The attempt is counted before the limits are checked, as the
+            # customer and IP address ones were when the transaction was created
+            if tx_sudo.smobilpay_phone_number != clean_phone:
+                tx_sudo._smobilpay_count_attempt([('phone', clean_phone)])
+            try:
+                tx_sudo._smobilpay_check_velocity(phone=clean_phone)
+            except ValidationError as e:
+                status = 429
+                return self._json_response({'status': 'error', 'error': str(e)}, status)
+
+            tx_sudo.write({
+                'smobilpay_phone_number': clean_phone,
+                'smobilpay_payment_method': method,
+            })
+            # Concurrent submissions are serialized on the idempotency key
+            payment_url = tx_sudo._smobilpay_create_payment_request()
+            if not payment_url:
+                # SmobilPay is unreachable: the request is queued and sent once it recovers
+                status = 202
+                return self._json_response({'status': 'queued', 'redirect_url': '/payment/status'}, status)
+
+            return self._json_response({'status': 'success', 'payment_url': payment_url}, status)
+
+        except psycopg2.OperationalError:
+            # A concurrent submission holds the idempotency key: Odoo retries the
+            # request, which then returns the payment URL of the first one
+            status = 'retry'
+            raise
+        except UserError as e:
+            status = 502
+            _logger.exception("Error creating SmobilPay payment request: %s", str(e))
+            return self._json_response({'status': 'error', 'error': _("Payment request failed. Please try again.")}, status)
+        finally:
+            _logger.info(
+                "SmobilPay create for merchant reference %s answered %s in %.1f ms",
+                merchant_reference, status, (time.perf_counter() - start) * 1000
+            )
+
+    @http.route('/payment/smobilpay/health', type='http', auth='public', methods=['GET'], save_session=False)
+    def smobilpay_health(self, **kwargs):
+        """Machine-readable health of the SmobilPay providers, for load balancers and monitoring
+
+        Serves the overall status from the results of the background probe (see
+        the "SmobilPay: Health Probe" scheduled action), kept in memory for a few
+        seconds, so probing this route never calls the SmobilPay API. The
+        details of each provider are served to administrators only, by
+        `/payment/smobilpay/health/details`.
+        """
+        health, status = self._get_cached_health()
+        return self._json_response({'status': health['status']}, status=status)
+
+    @http.route('/payment/smobilpay/health/details', type='http', auth='user', methods=['GET'])
+    def smobilpay_health_details(self, **kwargs):
+        """Health of each SmobilPay provider and the notification backlogs (admin only)"""
+        if not request.env.user.has_group('base.group_system'):
+            return werkzeug.exceptions.Forbidden()
+        health, status = self._get_cached_health()
+        return self._json_response(health, status=status)
+
+    def _get_cached_health(self):
+        """Return the health of the providers and its HTTP status, cached per database"""
+        now = time.monotonic()
+        cached = _health_cache.get(request.db)
+        if not cached or cached[0] < now:
+            health = request.env['payment.provider'].sudo()._smobilpay_get_health()
+            status = 503 if health['status'] == 'down' else 200
+            cached = _health_cache[request.db] = (now + const.HEALTH_CACHE_TTL, health, status)
+        return cached[1], cached[2]
+
+    def _json_response(self, data, status=200):
+        """Return a plain JSON response for the frontend widget"""
+        return request.make_response(
+            json.dumps(data),
+            headers=[('Content-Type', 'application/json'), ('Cache-Control', 'no-store')],
+            status=status,
+        )
 
     def _redirect_after_payment(self, tx_sudo):
         """Redirect customer after payment based on transaction state"""
@@ -161,17 +299,61 @@ class SmobilpayController(http.Controller):
             # Payment pending - show status page
             return request.redirect('/payment/status')
 
+    @http.route('/payment/smobilpay/export', type='http', auth='user', methods=['GET'])
+    def smobilpay_export(self, file_format='csv', provider_id=None, payment_method=None,
+                         state=None, date_from=None, date_to=None, **kwargs):
+        """Stream the SmobilPay transactions of the user's companies as CSV or XLSX (admin only)
+
+        Dates are `YYYY-MM-DD`, in UTC, both included.
+        """
+        if not request.env.user.has_group('base.group_system'):
+            return werkzeug.exceptions.Forbidden()
+        if file_format not in ('csv', 'xlsx'):
+            return werkzeug.exceptions.BadRequest()
+
+        try:
+            export = TransactionExport(
+                request.env.cr.dbname,
+                request.env.user.company_ids.ids,
+                provider_id=provider_id and int(provider_id),
+                payment_method=payment_method or None,
+                state=state or None,
+                date_from=date_from and datetime.strptime(date_from, '%Y-%m-%d'),
+                date_to=date_to and datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1),
+            )
+        except ValueError:
+            return werkzeug.exceptions.BadRequest()
+
+        if file_format == 'xlsx':
+            content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            body = export.iter_xlsx()
+        else:
+            content_type = 'text/csv; charset=utf-8'
+            body = export.iter_csv()
+        filename = f'smobilpay_transactions_{datetime.utcnow():%Y%m%d_%H%M%S}.{file_format}'
+        return request.make_response(body, headers=[
+            ('Content-Type', content_type),
+            ('Content-Disposition', http.content_disposition(filename)),
+            ('Cache-Control', 'no-store'),
+        ])
+
     @http.route('/payment/smobilpay/test', type='http', auth='user', methods=['GET'])
-    def smobilpay_test_connection(self, **kwargs):
-        """Test SmobilPay API connection (admin only)"""
+    def smobilpay_test_connection(self, provider_id=None, **kwargs):
+        """Test SmobilPay API connection (admin only)
+
+        Tests the provider given by `provider_id`, or else the one of the
+        current company.
+        """
         if not request.env.user.has_group('base.group_system'):
             return werkzeug.exceptions.Forbidden()
             
         try:
-            provider = request.env['payment.provider'].sudo().search([
-                ('code', '=', 'smobilpay'), 
-                ('state', '!=', 'disabled')
-            ], limit=1)
+            domain = [('code', '=', 'smobilpay'), ('state', '!=', 'disabled')]
+            if provider_id:
+                domain.append(('id', '=', int(provider_id)))
+            else:
+                domain.append(('company_id', '=', request.env.company.id))
+            provider = request.env['payment.provider'].sudo().search(domain, limit=1)
             
             if not provider:
                 return request.make_response("SmobilPay provider not found or disabled", 404)
@@ -182,6 +364,7 @@ class SmobilpayController(http.Controller):
                 return request.make_response(
                     "<h2>SmobilPay Connection Test</h2>"
                     "<p style='color: green;'>✓ Successfully connected to SmobilPay API</p>"
+                    f"<p>Provider: {provider.name} ({provider.company_id.name})</p>"
                     f"<p>API URL: {provider._smobilpay_get_api_url()}</p>"
                     f"<p>Environment: {'Test' if provider.state == 'test' else 'Production'}</p>"
                 )
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import io
+import tempfile
+
+import xlsxwriter
+
+from odoo.addons.smobilpay_odoo_gateway import const, replica
+
+# Exported columns: (header, SQL expression)
+COLUMNS = [
+    ("Reference", "tx.reference"),
+    ("Merchant Reference", "tx.smobilpay_merchant_reference"),
+    ("SmobilPay Payment ID", "tx.smobilpay_payment_id"),
+    ("Operator", "tx.smobilpay_payment_method"),
+    ("Phone Number", "tx.smobilpay_phone_number"),
+    ("Amount", "tx.amount"),
+    ("Currency", "currency.name"),
+    ("Status", "tx.state"),
+    ("Created On (UTC)", "tx.create_date"),
+    ("Last Status Change (UTC)", "tx.last_state_change"),
+]
+
+
+class TransactionExport:
+    """Export of SmobilPay transactions streamed to the HTTP response
+
+    Rows are read through a server-side cursor in chunks of
+    `const.EXPORT_CHUNK_SIZE` and written out chunk by chunk, so the memory
+    used does not depend on the number of exported transactions.
+
+    The export runs in its own read-only transaction, on the read replica
+    when one is usable: the response body is produced after the request's
+    cursor has been closed.
+    """
+
+    def __init__(self, dbname, company_ids, provider_id=None, payment_method=None, state=None,
+                 date_from=None, date_to=None):
+        self.dbname = dbname
+        self.company_ids = tuple(company_ids)
+        self.provider_id = provider_id
+        self.payment_method = payment_method
+        self.state = state
+        self.date_from = date_from
+        self.date_to = date_to
+
+    def _get_query(self):
+        conditions = ["provider.code = 'smobilpay'", "tx.company_id IN %s"]
+        params = [self.company_ids]
+        if self.provider_id:
+            conditions.append("tx.provider_id = %s")
+            params.append(self.provider_id)
+        if self.payment_method:
+            conditions.append("tx.smobilpay_payment_method = %s")
+            params.append(self.payment_method)
+        if self.state:
+            conditions.append("tx.state = %s")
+            params.append(self.state)
+        if self.date_from:
+            conditions.append("tx.create_date >= %s")
+            params.append(self.date_from)
+        if self.date_to:
+            conditions.append("tx.create_date < %s")
+            params.append(self.date_to)
+
+        query = f"""
+            SELECT {', '.join(expression for _header, expression in COLUMNS)}
+              FROM payment_transaction tx
+              JOIN payment_provider provider ON provider.id = tx.provider_id
+              JOIN res_currency currency ON currency.id = tx.currency_id
+             WHERE {' AND '.join(conditions)}
+          ORDER BY tx.id
+        """
+        return query, params
+
+    def iter_chunks(self):
+        """Yield the exported rows, one list of at most `const.EXPORT_CHUNK_SIZE` rows at a time"""
+        query, params = self._get_query()
+        with replica.cursor(self.dbname) as cr:
+            cr.execute(f"DECLARE smobilpay_export NO SCROLL CURSOR FOR {query}", params)
+            while True:
+                cr.execute("FETCH FORWARD %s FROM smobilpay_export", [const.EXPORT_CHUNK_SIZE])
+                rows = cr.fetchall()
+                if not rows:
+                    break
+                yield rows
+
+    def iter_csv(self):
+        """Yield the export as CSV, encoded in UTF-8 with a BOM for spreadsheet software"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([header for header, _expression in COLUMNS])
+        yield buffer.getvalue().encode('utf-8-sig')
+
+        for rows in self.iter_chunks():
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(
+                [value.isoformat(sep=' ') if hasattr(value, 'isoformat') else value for value in row]
+                for row in rows
+            )
+            yield buffer.getvalue().encode('utf-8')
+
+    def iter_xlsx(self):
+        """Yield the export as an XLSX workbook
+
+        The XLSX format is a zip archive that can only be sent once complete:
+        rows are written to a temporary file in constant-memory mode, which
+        is then streamed. Sheets are added when one is full.
+        """
+        with tempfile.TemporaryFile() as file:
+            workbook = xlsxwriter.Workbook(file, {'constant_memory': True})
+            date_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+            sheet, row_index = None, const.EXPORT_XLSX_MAX_ROWS
+            for rows in self.iter_chunks():
+                for row in rows:
+                    if row_index == const.EXPORT_XLSX_MAX_ROWS:
+                        sheet = workbook.add_worksheet()
+                        sheet.write_row(0, 0, [header for header, _expression in COLUMNS])
+                        row_index = 1
+                    for column, value in enumerate(row):
+                        if hasattr(value, 'isoformat'):
+                            sheet.write_datetime(row_index, column, value, date_format)
+                        else:
+                            sheet.write(row_index, column, value)
+                    row_index += 1
+            if sheet is None:
+                workbook.add_worksheet().write_row(0, 0, [header for header, _expression in COLUMNS])
+            workbook.close()
+
+            file.seek(0)
+            yield from iter(lambda: file.read(const.EXPORT_FILE_CHUNK_SIZE), b'')
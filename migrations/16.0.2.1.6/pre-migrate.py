@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+
+from odoo.addons.smobilpay_odoo_gateway import utils
+
+
+def migrate(cr, version):
+    """Install pg_trgm, needed by the trigram indexes of `payment.transaction`"""
+    utils.install_pg_trgm(cr)
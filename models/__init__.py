@@ -1,4 +1,16 @@
 # -*- coding: utf-8 -*-
 
+from . import ir_http
+from . import ir_websocket
 from . import payment_provider
-from . import payment_transaction
\ No newline at end of file
+from . import payment_transaction
+from . import smobilpay_idempotency
+from . import res_currency
+from . import smobilpay_rate_limit
+from . import smobilpay_profile_trace
+from . import smobilpay_backfill_checkpoint
+from . import smobilpay_saved_number
+from . import smobilpay_dead_letter
+from . import smobilpay_velocity_counter
+from . import smobilpay_outbox
+from . import smobilpay_latency_sketch
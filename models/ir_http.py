@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models
+from odoo.http import request
+
+from odoo.addons.smobilpay_odoo_gateway import utils
+
+
+class IrHttp(models.AbstractModel):
+    _inherit = 'ir.http'
+
+    @classmethod
+    def _pre_dispatch(cls, rule, args):
+        super()._pre_dispatch(rule, args)
+        # Warm up the active SmobilPay providers on the first request of each
+        # worker: the registry is loaded before prefork workers are spawned,
+        # and recycled workers start with an empty state
+        if utils.claim_warm_up(request.db):
+            request.env['payment.provider'].browse()._smobilpay_start_warm_up()
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models
+
+
+class IrWebsocket(models.AbstractModel):
+    _inherit = 'ir.websocket'
+
+    def _build_bus_channel_list(self, channels):
+        # The operations dashboards are pushed to the administrators' group
+        # channel, which the bus does not subscribe users to by default
+        if self.env.uid and self.env.user.has_group('base.group_system'):
+            channels = list(channels)
+            channels.append(self.env.ref('base.group_system'))
+        return super()._build_bus_channel_list(channels)
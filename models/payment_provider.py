@@ -1,11 +1,17 @@
 # -*- coding: utf-8 -*-
 
 import logging
+import threading
+import time
+from datetime import timedelta
+
 import requests
 from werkzeug import urls
 
-from odoo import _, api, fields, models
+import odoo
+from odoo import _, api, fields, models, tools
 from odoo.exceptions import ValidationError, UserError
+from odoo.addons.smobilpay_odoo_gateway import async_client, const, profiling, rate_limit, replica, utils
 
 _logger = logging.getLogger(__name__)
 
@@ -34,9 +40,40 @@ class PaymentProvider(models.Model):
     
     smobilpay_webhook_secret = fields.Char(
         string="Webhook Secret",
-        help="Secret key for webhook validation",
+        help="Secret key for webhook validation. When it is changed, the old secret is kept as "
+             "the previous secret and still accepted for the grace period.",
+        groups="base.group_system"
+    )
+    smobilpay_webhook_secret_previous = fields.Char(
+        string="Previous Webhook Secret",
+        help="Secret replaced by the last rotation, accepted until it expires",
+        groups="base.group_system"
+    )
+    smobilpay_webhook_secret_expiry = fields.Datetime(
+        string="Previous Secret Valid Until",
+        help="Leave empty to accept the previous secret until it is dropped",
+        groups="base.group_system"
+    )
+    smobilpay_webhook_secret_grace = fields.Integer(
+        string="Secret Rotation Grace (h)",
+        help="How long the previous webhook secret is accepted after the secret is changed",
+        default=const.WEBHOOK_SECRET_GRACE_HOURS,
         groups="base.group_system"
     )
+
+    # Webhook signatures verified with each secret since the last rotation
+    smobilpay_webhook_current_matches = fields.Integer(
+        string="Signed With Current Secret", readonly=True, groups="base.group_system"
+    )
+    smobilpay_webhook_previous_matches = fields.Integer(
+        string="Signed With Previous Secret", readonly=True, groups="base.group_system"
+    )
+    smobilpay_webhook_previous_last_match = fields.Datetime(
+        string="Previous Secret Last Used", readonly=True, groups="base.group_system"
+    )
+    smobilpay_webhook_invalid_count = fields.Integer(
+        string="Invalid Signatures", readonly=True, groups="base.group_system"
+    )
     
     # Environment settings
     smobilpay_api_url = fields.Char(
@@ -46,20 +83,173 @@ class PaymentProvider(models.Model):
         groups="base.group_system"
     )
 
+    smobilpay_idempotency_ttl = fields.Integer(
+        string="Order Cache Lifetime (min)",
+        help="How long a created SmobilPay order is reused for retries of the same transaction",
+        default=const.IDEMPOTENCY_TTL_MINUTES,
+    )
+
+    smobilpay_rate_limit = fields.Float(
+        string="API Rate Limit (req/s)",
+        help="Sustained number of SmobilPay API calls per second allowed across all workers. "
+             "Set to 0 to disable client-side rate limiting.",
+        default=const.RATE_LIMIT_DEFAULT_RATE,
+    )
+    smobilpay_rate_burst = fields.Integer(
+        string="API Rate Burst",
+        help="Number of SmobilPay API calls that may be sent at once after an idle period",
+        default=const.RATE_LIMIT_DEFAULT_BURST,
+    )
+
+    smobilpay_velocity_window = fields.Integer(
+        string="Velocity Window (min)",
+        help="Sliding window over which payment attempts are counted per phone number, "
+             "customer and IP address",
+        default=const.VELOCITY_DEFAULT_WINDOW,
+    )
+    # Limits per key type, each disabled at 0: customers behind a carrier-grade
+    # NAT share their IP address, so it should rarely be limited
+    smobilpay_velocity_max_attempts_phone = fields.Integer(
+        string="Max Attempts per Phone Number",
+        help="Payment attempts allowed per phone number within the velocity window. "
+             "Set to 0 to disable.",
+    )
+    smobilpay_velocity_max_attempts_partner = fields.Integer(
+        string="Max Attempts per Customer",
+        help="Payment attempts allowed per customer within the velocity window. "
+             "Set to 0 to disable.",
+    )
+    smobilpay_velocity_max_attempts_ip = fields.Integer(
+        string="Max Attempts per IP Address",
+        help="Payment attempts allowed per IP address within the velocity window. "
+             "Set to 0 to disable.",
+    )
+    smobilpay_velocity_max_amount_phone = fields.Float(
+        string="Max Amount per Phone Number",
+        help="Total amount, in the transaction currency, allowed per phone number within the "
+             "velocity window. Set to 0 to disable.",
+    )
+    smobilpay_velocity_max_amount_partner = fields.Float(
+        string="Max Amount per Customer",
+        help="Total amount, in the transaction currency, allowed per customer within the "
+             "velocity window. Set to 0 to disable.",
+    )
+    smobilpay_velocity_max_amount_ip = fields.Float(
+        string="Max Amount per IP Address",
+        help="Total amount, in the transaction currency, allowed per IP address within the "
+             "velocity window. Set to 0 to disable.",
+    )
+
+    smobilpay_store_and_forward = fields.Boolean(
+        string="Queue Payments During Outages",
+        help="When the SmobilPay API is unreachable, queue the payment requests and send them "
+             "once it recovers, instead of failing the payment",
+    )
+    smobilpay_outbox_ttl = fields.Integer(
+        string="Queued Payment Lifetime (min)",
+        help="Payment requests queued during an outage for longer than this are discarded",
+        default=const.OUTBOX_DEFAULT_TTL,
+    )
+
+    smobilpay_latency_p95_threshold = fields.Integer(
+        string="p95 Confirmation Alert (s)",
+        help="Alert when the 95th percentile of the time from transaction creation to payment "
+             "confirmation of an operator exceeds this. Set to 0 to disable.",
+        default=const.LATENCY_DEFAULT_P95_THRESHOLD,
+    )
+
+    smobilpay_batch_post_processing = fields.Boolean(
+        string="Batch Post-Processing",
+        help="Post-process confirmed SmobilPay payments (payment creation, invoice reconciliation, "
+             "order confirmation) in batches from a scheduled action, instead of one by one when "
+             "each confirmation is received. Order confirmations may then take up to a minute.",
+    )
+
+    # Result of the last background health probe
+    smobilpay_probe_date = fields.Datetime(string="Last Probe", readonly=True)
+    smobilpay_probe_token_ok = fields.Boolean(string="Token Valid", readonly=True)
+    smobilpay_probe_ping_ms = fields.Float(string="Ping (ms)", readonly=True, digits=(16, 1))
+    smobilpay_probe_circuit_state = fields.Selection(
+        string="Probed Circuit State",
+        selection=[('closed', "Closed"), ('open', "Open"), ('half_open', "Half-Open")],
+        readonly=True,
+    )
+    smobilpay_probe_pending_count = fields.Integer(string="Pending Transactions", readonly=True)
+    smobilpay_probe_oldest_pending_date = fields.Datetime(string="Oldest Pending Since", readonly=True)
+    smobilpay_probe_error = fields.Char(string="Probe Error", readonly=True)
+
+    def write(self, values):
+        """Drop cached tokens and connections when the credentials change"""
+        reset_fields = {
+            'state', 'company_id', 'smobilpay_consumer_key', 'smobilpay_consumer_secret',
+        }
+        if reset_fields & set(values):
+            for provider in self.filtered(lambda p: p.code == 'smobilpay'):
+                utils.reset_provider_state(provider)
+
+        # Keep accepting webhooks signed with the replaced secret during the rotation
+        if 'smobilpay_webhook_secret' in values and 'smobilpay_webhook_secret_previous' not in values:
+            for provider in self.filtered(
+                lambda p: p.code == 'smobilpay' and p.smobilpay_webhook_secret
+                and p.smobilpay_webhook_secret != values['smobilpay_webhook_secret']
+            ):
+                super(PaymentProvider, provider).write(provider._smobilpay_get_rotation_values())
+        res = super().write(values)
+
+        # Fetch the token of newly activated providers before the first checkout
+        if values.get('state') in ('enabled', 'test'):
+            providers = self.filtered(lambda p: p.code == 'smobilpay')
+            if providers:
+                self.env.cr.postcommit.add(providers._smobilpay_start_warm_up)
+        return res
+
+    def _smobilpay_start_warm_up(self):
+        """Warm up the tokens and connections of `self` in a background thread
+
+        With an empty recordset, all enabled and test SmobilPay providers are
+        warmed up.
+        """
+        thread = threading.Thread(
+            target=self._smobilpay_warm_up,
+            args=(self.env.cr.dbname, self.ids),
+            name='smobilpay.warm_up',
+            daemon=True,
+        )
+        thread.start()
+
+    @classmethod
+    def _smobilpay_warm_up(cls, dbname, provider_ids):
+        """Fetch an access token, which also opens a pooled connection, per provider"""
+        try:
+            registry = odoo.registry(dbname)
+            deadline = time.monotonic() + const.WARM_UP_REGISTRY_TIMEOUT
+            while not registry.ready and time.monotonic() < deadline:
+                time.sleep(1)
+
+            with registry.cursor() as cr:
+                env = api.Environment(cr, odoo.SUPERUSER_ID, {})
+                domain = [('code', '=', 'smobilpay'), ('state', 'in', ('enabled', 'test'))]
+                if provider_ids:
+                    domain.append(('id', 'in', provider_ids))
+                for provider in env['payment.provider'].search(domain):
+                    if provider._smobilpay_get_access_token():
+                        _logger.info("SmobilPay: warmed up provider %s", provider.id)
+        except Exception:
+            _logger.exception("SmobilPay: provider warm-up failed")
+
     def _get_default_smobilpay_api_url(self):
         """Get default API URL based on state"""
         return "https://api.enkap.cm" if not self.state == 'test' else "https://api-staging.enkap.cm"
 
     @api.model
     def _get_compatible_providers(self, *args, currency_id=None, **kwargs):
-        """Override to include SmobilPay for supported currencies"""
+        """Override to exclude SmobilPay for unsupported currencies"""
         providers = super()._get_compatible_providers(*args, currency_id=currency_id, **kwargs)
-        
-        # SmobilPay supports XAF (Central African Franc) primarily
-        currency = self.env['res.currency'].browse(currency_id) if currency_id else None
-        if currency and currency.name in ['XAF', 'EUR', 'USD']:
+
+        # Company and country are already filtered by the base method
+        if currency_id and currency_id not in self._smobilpay_get_supported_currency_ids():
             providers = providers.filtered(lambda p: p.code != 'smobilpay')
-        
+
         return providers
 
     def _get_supported_currencies(self):
@@ -67,65 +257,232 @@ class PaymentProvider(models.Model):
         supported_currencies = super()._get_supported_currencies()
         if self.code == 'smobilpay':
             # SmobilPay primarily supports XAF but can handle other currencies
+            supported_currency_ids = self._smobilpay_get_supported_currency_ids()
             supported_currencies = supported_currencies.filtered(
-                lambda c: c.name in ['XAF', 'EUR', 'USD']
+                lambda c: c.id in supported_currency_ids
             )
         return supported_currencies
 
+    @api.model
+    @tools.ormcache()
+    def _smobilpay_get_supported_currency_ids(self):
+        """Return the ids of the currencies SmobilPay can process
+
+        The result is cached until a currency is created, renamed or deleted.
+        """
+        currencies = self.env['res.currency'].with_context(active_test=False).search([
+            ('name', 'in', const.SUPPORTED_CURRENCIES)
+        ])
+        return frozenset(currencies.ids)
+
+    def _smobilpay_get_velocity_limits(self):
+        """Return the enabled velocity limits of the provider
+
+        :return: The limits, as `{key_type: (max_attempts, max_amount)}`, 0 meaning
+                 no limit; the key types without any limit are left out
+        :rtype: dict
+        """
+        self.ensure_one()
+        limits = {}
+        for key_type in const.VELOCITY_KEY_TYPES:
+            max_attempts = self[f'smobilpay_velocity_max_attempts_{key_type}']
+            max_amount = self[f'smobilpay_velocity_max_amount_{key_type}']
+            if max_attempts or max_amount:
+                limits[key_type] = (max_attempts, max_amount)
+        return limits
+
     def _smobilpay_get_api_url(self):
         """Get the appropriate API URL based on environment"""
         if self.state == 'test':
             return "https://api-staging.enkap.cm"
         return "https://api.enkap.cm"
 
-    def _smobilpay_make_request(self, endpoint, data=None, method='GET'):
-        """Make authenticated request to SmobilPay API"""
+    def _smobilpay_make_request(self, endpoint, data=None, method='GET', lane='checkout'):
+        """Make authenticated request to SmobilPay API
+
+        :param str lane: The rate limiting priority lane, `checkout` for calls
+                         made while a customer waits, `background` otherwise
+        """
+        self.ensure_one()
         url = f"{self._smobilpay_get_api_url()}{endpoint}"
-        
+        state = utils.get_provider_state(self)
+
+        if not state.allow_request():
+            raise UserError(_(
+                "SmobilPay API is temporarily unavailable for provider %s, please try again later"
+            ) % self.name)
+
         # Get OAuth token
         token = self._smobilpay_get_access_token()
         if not token:
             raise UserError(_("Failed to authenticate with SmobilPay API"))
-            
+
+        try:
+            response = self._smobilpay_send(state, url, token, data, method, lane)
+            if response.status_code == 401:
+                # The cached token was revoked or expired early: renew it once
+                state.clear_token()
+                token = self._smobilpay_get_access_token()
+                if not token:
+                    raise UserError(_("Failed to authenticate with SmobilPay API"))
+                response = self._smobilpay_send(state, url, token, data, method, lane)
+
+            response.raise_for_status()
+            state.record_success()
+            return response.json()
+
+        except requests.RequestException as e:
+            # Client errors are the caller's fault and say nothing about the API health
+            status_code = e.response.status_code if e.response is not None else None
+            if status_code is None or status_code >= 500:
+                state.record_failure(str(e))
+            _logger.error("SmobilPay API request failed for provider %s: %s", self.id, str(e))
+            if status_code == 429:
+                raise UserError(_("SmobilPay API rate limit reached, please try again in a moment"))
+            raise UserError(_("Communication with SmobilPay API failed: %s") % str(e))
+
+    def _smobilpay_send(self, state, url, token, data, method, lane='checkout'):
+        """Send one request through the provider's pooled session
+
+        The call waits for the cluster-wide rate limiter, and is retried after
+        the delay given by SmobilPay when it answers HTTP 429.
+        """
         headers = {
             'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json',
             'Accept': 'application/json',
         }
-        
-        try:
+        limiter = rate_limit.RateLimiter(self)
+        for _attempt in range(const.RATE_LIMIT_MAX_RETRIES + 1):
+            limiter.acquire(lane)
+            start = time.perf_counter()
             if method.upper() == 'POST':
-                response = requests.post(url, json=data, headers=headers, timeout=30)
+                response = state.session.post(url, json=data, headers=headers, timeout=30)
             else:
-                response = requests.get(url, params=data, headers=headers, timeout=30)
-                
-            response.raise_for_status()
-            return response.json()
-            
-        except requests.RequestException as e:
-            _logger.error("SmobilPay API request failed: %s", str(e))
-            raise UserError(_("Communication with SmobilPay API failed: %s") % str(e))
+                response = state.session.get(url, params=data, headers=headers, timeout=30)
+            profiling.record_http(time.perf_counter() - start)
+            if response.status_code != 429:
+                break
+            limiter.block(rate_limit.parse_retry_after(response.headers.get('Retry-After')))
+        return response
 
     def _smobilpay_get_access_token(self):
-        """Get OAuth access token from SmobilPay"""
-        auth_url = f"{self._smobilpay_get_api_url()}/oauth/token"
-        
-        auth_data = {
-            'grant_type': 'client_credentials',
-            'client_id': self.smobilpay_consumer_key,
-            'client_secret': self.smobilpay_consumer_secret,
+        """Get OAuth access token from SmobilPay, cached per provider"""
+        self.ensure_one()
+        state = utils.get_provider_state(self)
+        token = state.get_token()
+        if token:
+            return token
+
+        with state.lock:
+            # Another thread may have renewed the token while we waited
+            token = state.get_token()
+            if token:
+                return token
+
+            auth_url = f"{self._smobilpay_get_api_url()}/oauth/token"
+            auth_data = {
+                'grant_type': 'client_credentials',
+                'client_id': self.smobilpay_consumer_key,
+                'client_secret': self.smobilpay_consumer_secret,
+            }
+
+            try:
+                start = time.perf_counter()
+                try:
+                    response = state.session.post(auth_url, data=auth_data, timeout=30)
+                finally:
+                    profiling.record_http(time.perf_counter() - start)
+                response.raise_for_status()
+
+                token_data = response.json()
+                token = token_data.get('access_token')
+                if token:
+                    state.set_token(token, token_data.get('expires_in'))
+                return token
+
+            except requests.RequestException as e:
+                status_code = e.response.status_code if e.response is not None else None
+                if status_code is None or status_code >= 500:
+                    state.record_failure(str(e))
+                _logger.error("Failed to get SmobilPay access token for provider %s: %s", self.id, str(e))
+                return False
+
+    def _smobilpay_batch_request(self, calls, concurrency=const.ASYNC_CONCURRENCY_LIMIT):
+        """Send many `(endpoint, data, method)` calls concurrently with asyncio
+
+        Meant for cron and batch jobs; requires the optional aiohttp library.
+
+        :return: The responses in the order of `calls`, failed calls being
+                 returned as their exception
+        :rtype: list
+        """
+        self.ensure_one()
+        return async_client.run_sync(self, lambda client: client.gather(calls), concurrency)
+
+    def _smobilpay_get_rotation_values(self):
+        """Return the values moving the current webhook secret to the previous one"""
+        self.ensure_one()
+        return {
+            'smobilpay_webhook_secret_previous': self.smobilpay_webhook_secret,
+            'smobilpay_webhook_secret_expiry': fields.Datetime.now() + timedelta(
+                hours=self.smobilpay_webhook_secret_grace
+            ),
+            'smobilpay_webhook_current_matches': 0,
+            'smobilpay_webhook_previous_matches': 0,
+            'smobilpay_webhook_previous_last_match': False,
+            'smobilpay_webhook_invalid_count': 0,
         }
-        
-        try:
-            response = requests.post(auth_url, data=auth_data, timeout=30)
-            response.raise_for_status()
-            
-            token_data = response.json()
-            return token_data.get('access_token')
-            
-        except requests.RequestException as e:
-            _logger.error("Failed to get SmobilPay access token: %s", str(e))
-            return False
+
+    def _smobilpay_get_webhook_macs(self):
+        """Return the HMACs keyed with the webhook secrets currently accepted
+
+        :return: The (label, hmac) of the current secret and, unless it
+                 expired, of the previous one
+        :rtype: list
+        """
+        self.ensure_one()
+        secrets = [('current', self.smobilpay_webhook_secret)]
+        expiry = self.smobilpay_webhook_secret_expiry
+        if self.smobilpay_webhook_secret_previous and (not expiry or expiry > fields.Datetime.now()):
+            secrets.append(('previous', self.smobilpay_webhook_secret_previous))
+        return utils.get_provider_state(self).get_webhook_macs(tuple(secrets))
+
+    def _smobilpay_record_webhook_match(self, label):
+        """Count a webhook whose signature matched the secret `label`, or 'invalid'
+
+        Counts are kept by the worker and added to the provider at most once
+        per `const.WEBHOOK_MATCH_FLUSH_INTERVAL`, so webhooks do not all
+        update the provider row. They are added from their own short
+        transaction, which skips the row while another transaction, such as
+        the health probe, holds it: the webhook never waits for it, and the
+        counts are kept for the next flush.
+        """
+        self.ensure_one()
+        state = utils.get_provider_state(self)
+        matches = state.record_webhook_match(label)
+        if not matches:
+            return
+        with self.pool.cursor() as cr:
+            cr.execute("""
+                UPDATE payment_provider
+                   SET smobilpay_webhook_current_matches = COALESCE(smobilpay_webhook_current_matches, 0) + %s,
+                       smobilpay_webhook_previous_matches = COALESCE(smobilpay_webhook_previous_matches, 0) + %s,
+                       smobilpay_webhook_invalid_count = COALESCE(smobilpay_webhook_invalid_count, 0) + %s,
+                       smobilpay_webhook_previous_last_match = CASE
+                           WHEN %s > 0 THEN NOW() AT TIME ZONE 'UTC'
+                           ELSE smobilpay_webhook_previous_last_match
+                       END
+                 WHERE id IN (SELECT id FROM payment_provider WHERE id = %s FOR UPDATE SKIP LOCKED)
+            """, [matches['current'], matches['previous'], matches['invalid'], matches['previous'], self.id])
+            flushed = cr.rowcount
+        if not flushed:
+            state.restore_webhook_matches(matches)
+            return
+        self.invalidate_recordset([
+            'smobilpay_webhook_current_matches', 'smobilpay_webhook_previous_matches',
+            'smobilpay_webhook_previous_last_match', 'smobilpay_webhook_invalid_count',
+        ])
 
     def _smobilpay_register_callback_url(self, callback_url):
         """Register callback URL with SmobilPay"""
@@ -174,6 +531,114 @@ class PaymentProvider(models.Model):
             if not provider.smobilpay_consumer_secret:
                 raise ValidationError(_("SmobilPay Consumer Secret is required"))
 
+    @api.model
+    def _cron_smobilpay_health_probe(self):
+        """Probe the active SmobilPay providers and store the results
+
+        The health endpoint serves these stored results, so monitoring never
+        triggers calls to the SmobilPay API.
+        """
+        providers = self.search([('code', '=', 'smobilpay'), ('state', 'in', ('enabled', 'test'))])
+        if not providers:
+            return
+
+        with replica.cursor(self.env.cr.dbname, fallback=self.env.cr) as cr:
+            cr.execute("""
+                SELECT provider_id, COUNT(*), MIN(create_date)
+                  FROM payment_transaction
+                 WHERE state = 'pending' AND provider_id IN %s
+              GROUP BY provider_id
+            """, [tuple(providers.ids)])
+            pending = {provider_id: (count, oldest) for provider_id, count, oldest in cr.fetchall()}
+
+        for provider in providers:
+            values = provider._smobilpay_probe()
+            count, oldest = pending.get(provider.id, (0, False))
+            values.update({
+                'smobilpay_probe_date': fields.Datetime.now(),
+                'smobilpay_probe_pending_count': count,
+                'smobilpay_probe_oldest_pending_date': oldest,
+            })
+            provider.write(values)
+
+    def _smobilpay_probe(self):
+        """Check the token and time a ping of the SmobilPay API"""
+        self.ensure_one()
+        values = {
+            'smobilpay_probe_token_ok': False,
+            'smobilpay_probe_ping_ms': 0.0,
+            'smobilpay_probe_error': False,
+        }
+        try:
+            values['smobilpay_probe_token_ok'] = bool(self._smobilpay_get_access_token())
+            start = time.perf_counter()
+            self._smobilpay_make_request('/api/ping', lane='background')
+            values['smobilpay_probe_ping_ms'] = (time.perf_counter() - start) * 1000
+        except Exception as e:
+            values['smobilpay_probe_error'] = str(e)[:255]
+        values['smobilpay_probe_circuit_state'] = utils.get_provider_state(self).circuit_state
+        return values
+
+    @api.model
+    def _smobilpay_get_health(self):
+        """Return the last probe results of the active SmobilPay providers
+
+        :return: The overall status (`ok`, `degraded` or `down`), the number
+                 of notifications awaiting a retry and the details of each
+                 provider
+        :rtype: dict
+        """
+        now = fields.Datetime.now()
+        stale_before = now - timedelta(seconds=const.HEALTH_PROBE_STALE_AFTER)
+        providers = self.sudo().search([('code', '=', 'smobilpay'), ('state', 'in', ('enabled', 'test'))])
+
+        details = []
+        for provider in providers:
+            healthy = (
+                bool(provider.smobilpay_probe_date)
+                and provider.smobilpay_probe_date >= stale_before
+                and provider.smobilpay_probe_token_ok
+                and not provider.smobilpay_probe_error
+                and provider.smobilpay_probe_circuit_state != 'open'
+            )
+            oldest = provider.smobilpay_probe_oldest_pending_date
+            details.append({
+                'id': provider.id,
+                'company_id': provider.company_id.id,
+                'state': provider.state,
+                'healthy': healthy,
+                'checked_at': provider.smobilpay_probe_date and fields.Datetime.to_string(provider.smobilpay_probe_date),
+                'token_valid': provider.smobilpay_probe_token_ok,
+                'ping_ms': round(provider.smobilpay_probe_ping_ms, 1),
+                'circuit_state': provider.smobilpay_probe_circuit_state or 'closed',
+                'pending_count': provider.smobilpay_probe_pending_count,
+                'oldest_pending_age_s': int((now - oldest).total_seconds()) if oldest else 0,
+                'error': provider.smobilpay_probe_error or None,
+            })
+
+        healthy_count = sum(1 for detail in details if detail['healthy'])
+        if details and healthy_count == len(details):
+            status = 'ok'
+        elif healthy_count:
+            status = 'degraded'
+        else:
+            status = 'down'
+        dead_letter_count = self.env['smobilpay.dead.letter'].sudo().search_count([('state', '=', 'pending')])
+        outbox_count = self.env['smobilpay.outbox'].sudo().search_count([('state', '=', 'queued')])
+        return {
+            'status': status,
+            'dead_letter_backlog': dead_letter_count,
+            'outbox_backlog': outbox_count,
+            'providers': details,
+        }
+
+    def action_smobilpay_drop_previous_webhook_secret(self):
+        """Stop accepting webhooks signed with the previous secret"""
+        self.write({
+            'smobilpay_webhook_secret_previous': False,
+            'smobilpay_webhook_secret_expiry': False,
+        })
+
     def action_test_smobilpay_connection(self):
         """Test connection to SmobilPay API"""
         self.ensure_one()
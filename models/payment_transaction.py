@@ -1,15 +1,25 @@
 # -*- coding: utf-8 -*-
 
-import hashlib
 import hmac
 import logging
+import time
 import uuid
 from datetime import datetime, timedelta
 from werkzeug import urls
 
+import psycopg2
+from markupsafe import Markup
+
 from odoo import _, api, fields, models
-from odoo.exceptions import ValidationError, UserError
+from odoo.exceptions import AccessError, ValidationError, UserError
+from odoo.http import request
+from odoo.modules.db import FunctionStatus
+from odoo.osv.expression import get_unaccent_wrapper
+from odoo.tools import config
+from odoo.tools.sql import create_index
 from odoo.addons.payment import utils as payment_utils
+from odoo.addons.smobilpay_odoo_gateway import const, profiling, replica, utils
+from odoo.addons.smobilpay_odoo_gateway.notification import SmobilpayNotification
 
 _logger = logging.getLogger(__name__)
 
@@ -22,12 +32,16 @@ class PaymentTransaction(models.Model):
         string="SmobilPay Payment ID",
         help="Unique payment identifier from SmobilPay",
         readonly=True,
+        index='trigram',
     )
     
     smobilpay_merchant_reference = fields.Char(
         string="Merchant Reference", 
         help="Unique merchant reference for this transaction",
         readonly=True,
+        # Looked up by equality on every notification: pg_trgm only serves `=`
+        # from PostgreSQL 14, so partial searches get their own index, see `init`
+        index=True,
     )
     
     smobilpay_payment_method = fields.Selection([
@@ -40,6 +54,7 @@ class PaymentTransaction(models.Model):
     smobilpay_phone_number = fields.Char(
         string="Phone Number",
         help="Customer's mobile money phone number",
+        index='trigram',
     )
     
     smobilpay_status_details = fields.Text(
@@ -48,12 +63,93 @@ class PaymentTransaction(models.Model):
         readonly=True,
     )
 
+    smobilpay_payment_url = fields.Char(
+        string="Payment URL",
+        help="SmobilPay payment page returned when the order was created",
+        readonly=True,
+    )
+
+    smobilpay_queued = fields.Boolean(
+        string="Queued During Outage",
+        help="The payment request waits for the SmobilPay API to be reachable again",
+        compute='_compute_smobilpay_queued',
+    )
+
+    def init(self):
+        super().init()
+        if not self.env.registry.has_trigram:
+            return
+        column = 'smobilpay_merchant_reference'
+        if self.env.registry.has_unaccent == FunctionStatus.INDEXABLE:
+            # Partial searches wrap the column in unaccent, as for the fields with index='trigram'
+            column = get_unaccent_wrapper(self.env.cr)(column)
+        create_index(
+            self.env.cr,
+            'payment_transaction_smobilpay_merchant_reference_trgm_idx',
+            self._table,
+            [f'{column} gin_trgm_ops'],
+            method='gin',
+            where='smobilpay_merchant_reference IS NOT NULL',
+        )
+
+    def _compute_smobilpay_queued(self):
+        queued_tx_ids = set(self.env['smobilpay.outbox'].sudo().search([
+            ('transaction_id', 'in', self.ids), ('state', '=', 'queued'),
+        ]).transaction_id.ids)
+        for tx in self:
+            tx.smobilpay_queued = tx.id in queued_tx_ids
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        txs = super().create(vals_list)
+        ip_address = request and request.httprequest.remote_addr
+        for tx in txs.filtered(lambda t: t.provider_code == 'smobilpay'):
+            tx._smobilpay_count_attempt([('partner', tx.partner_id.id), ('ip', ip_address)])
+        return txs
+
+    def _smobilpay_count_attempt(self, keys):
+        """Count a payment attempt of this transaction in the velocity counters"""
+        self.ensure_one()
+        self.env['smobilpay.velocity.counter'].sudo()._smobilpay_increment(keys, self.amount)
+
+    def _smobilpay_check_velocity(self, phone=None):
+        """Check the velocity limits of the provider for this transaction
+
+        :raise ValidationError: If a phone number, customer or IP address made
+                                too many attempts, or paid too much, recently
+        """
+        self.ensure_one()
+        provider = self.provider_id
+        limits = provider._smobilpay_get_velocity_limits()
+        if not limits:
+            return
+
+        keys = {
+            'phone': phone or self.smobilpay_phone_number,
+            'partner': self.partner_id.id,
+            'ip': request and request.httprequest.remote_addr,
+        }
+        totals = self.env['smobilpay.velocity.counter'].sudo()._smobilpay_get_totals(
+            [(key_type, keys[key_type]) for key_type in limits], provider.smobilpay_velocity_window
+        )
+        for (key_type, key), (attempts, amount) in totals.items():
+            max_attempts, max_amount = limits[key_type]
+            if (max_attempts and attempts > max_attempts) or (max_amount and amount > max_amount):
+                _logger.warning(
+                    "SmobilPay: velocity limit reached by %s %s for transaction %s",
+                    key_type, key, self.reference
+                )
+                raise ValidationError(_("Too many payment attempts, please try again later."))
+
+    @profiling.profiled('payment.transaction._get_specific_rendering_values')
     def _get_specific_rendering_values(self, processing_values):
         """Return SmobilPay-specific rendering values"""
         res = super()._get_specific_rendering_values(processing_values)
         if self.provider_code != 'smobilpay':
             return res
 
+        self._smobilpay_check_velocity()
+
         # Generate unique merchant reference
         merchant_reference = str(uuid.uuid4())
         self.smobilpay_merchant_reference = merchant_reference
@@ -81,6 +177,42 @@ class PaymentTransaction(models.Model):
         
         return rendering_values
 
+    def _get_post_processing_values(self):
+        """Keep the customer informed on /payment/status of a request sent late
+
+        The status page shows the `display_message` of the values it polls. A
+        request queued during an outage replaces the pending message of the
+        provider until it is sent; once it is, the customer still has to
+        approve the payment on the SmobilPay page, which the message links to.
+        """
+        values = super()._get_post_processing_values()
+        if self.provider_code != 'smobilpay' or self.state != 'pending':
+            return values
+
+        if self.smobilpay_queued:
+            values['display_message'] = _(
+                "SmobilPay is busy. Your payment request is saved and will be sent in a few "
+                "minutes: keep this page open to continue your payment."
+            )
+        elif self.smobilpay_payment_url:
+            values['smobilpay_payment_url'] = self.smobilpay_payment_url
+            values['display_message'] = Markup(_(
+                "Your payment request was sent to SmobilPay. "
+                "<a href=\"%s\" class=\"btn btn-primary\">Complete the payment on SmobilPay</a>"
+            )) % self.smobilpay_payment_url
+        return values
+
+    def _get_specific_processing_values(self, processing_values):
+        """Return the merchant reference the inline form creates the SmobilPay order with"""
+        res = super()._get_specific_processing_values(processing_values)
+        if self.provider_code != 'smobilpay':
+            return res
+
+        if not self.smobilpay_merchant_reference:
+            self.smobilpay_merchant_reference = str(uuid.uuid4())
+        return {'smobilpay_merchant_reference': self.smobilpay_merchant_reference}
+
+    @profiling.profiled('payment.transaction._get_tx_from_notification_data')
     def _get_tx_from_notification_data(self, provider_code, notification_data):
         """Override to handle SmobilPay notifications"""
         if provider_code != 'smobilpay':
@@ -90,12 +222,17 @@ class PaymentTransaction(models.Model):
         if not merchant_reference:
             raise ValidationError("SmobilPay: Missing merchant reference in notification data")
 
+        # The routes already fetched the transaction they call this on
+        if len(self) == 1 and self.smobilpay_merchant_reference == merchant_reference:
+            return self
+
         tx = self.search([('smobilpay_merchant_reference', '=', merchant_reference)], limit=1)
         if not tx:
             raise ValidationError(f"SmobilPay: No transaction found for reference {merchant_reference}")
 
         return tx
 
+    @profiling.profiled('payment.transaction._process_notification_data')
     def _process_notification_data(self, notification_data):
         """Process SmobilPay notification data"""
         super()._process_notification_data(notification_data)
@@ -103,57 +240,116 @@ class PaymentTransaction(models.Model):
         if self.provider_code != 'smobilpay':
             return
 
-        # Extract SmobilPay specific data
-        self.smobilpay_payment_id = notification_data.get('paymentId', '')
-        status = notification_data.get('status', '').upper()
-        
-        # Map SmobilPay statuses to Odoo transaction states
-        status_mapping = {
-            'CREATED': 'pending',
-            'INITIALISED': 'pending', 
-            'IN_PROGRESS': 'pending',
-            'CONFIRMED': 'done',
-            'FAILED': 'error',
-            'CANCELED': 'cancel',
-            'CANCELLED': 'cancel',
+        notification = SmobilpayNotification.parse(notification_data)
+
+        # Only the fields that changed are written. They stay in the ORM cache
+        # and are flushed with the state change below, in a single UPDATE.
+        # Empty values are read back as False, so '' and False are the same.
+        tx_values = {
+            fname: value
+            for fname, value in notification.get_tx_values().items()
+            if (self[fname] or False) != (value or False)
         }
-        
-        new_state = status_mapping.get(status, 'pending')
-        
-        # Update transaction details
-        self.smobilpay_status_details = notification_data.get('statusMessage', '')
-        
-        if notification_data.get('phoneNumber'):
-            self.smobilpay_phone_number = notification_data['phoneNumber']
-            
-        if notification_data.get('paymentMethod'):
-            method_mapping = {
-                'MTN_CM': 'mtn_cm',
-                'ORANGE_CM': 'orange_cm', 
-                'EXPRESS_UNION': 'express_union',
-                'SMOBILPAY_CASH': 'smobilpay_cash',
-            }
-            self.smobilpay_payment_method = method_mapping.get(
-                notification_data['paymentMethod'].upper(), 
-                'mtn_cm'
-            )
+        if tx_values:
+            self.write(tx_values)
+            if 'smobilpay_phone_number' in tx_values:
+                self._smobilpay_count_attempt([('phone', tx_values['smobilpay_phone_number'])])
+
+        previous_state = self.state
 
         # Update transaction state based on SmobilPay status
-        if new_state == 'done':
+        if notification.state == 'done':
             self._set_done()
-        elif new_state == 'error':
+            if self.state == 'done' and previous_state != 'done':
+                self.env['smobilpay.latency.sketch'].sudo()._smobilpay_record(self)
+            if self.partner_id and self.smobilpay_phone_number:
+                self.env['smobilpay.saved.number'].sudo()._smobilpay_save(
+                    self.partner_id, self.smobilpay_phone_number, self.smobilpay_payment_method
+                )
+        elif notification.state == 'error':
             self._set_error(
-                state_message=self.smobilpay_status_details or "Payment failed"
+                state_message=notification.status_message or "Payment failed"
             )
-        elif new_state == 'cancel':
+        elif notification.state == 'cancel':
             self._set_canceled(
-                state_message=self.smobilpay_status_details or "Payment cancelled"
+                state_message=notification.status_message or "Payment cancelled"
             )
         else:
             self._set_pending()
+        self.flush_recordset()
+
+        if self.state != previous_state:
+            self._smobilpay_send_ops_event(previous_state)
+
+    def _smobilpay_get_ops_event(self, previous_state=None):
+        """Return the state change of the transaction, as shown on the operations dashboard"""
+        self.ensure_one()
+        return {
+            'id': self.id,
+            'reference': self.reference,
+            'company_id': self.company_id.id,
+            'provider_id': self.provider_id.id,
+            'operator': self.smobilpay_payment_method or 'unknown',
+            'state': self.state,
+            'previous_state': previous_state,
+            'amount': self.amount,
+            'currency': self.currency_id.name,
+            'date': fields.Datetime.to_string(self.last_state_change),
+        }
+
+    def _smobilpay_send_ops_event(self, previous_state):
+        """Push the state change to the operations dashboards of the administrators
+
+        The dashboards aggregate these events in the browser, so watching them
+        costs no query. They go to the administrators' group channel, which
+        `ir.websocket` subscribes its members to.
+        """
+        self.env['bus.bus']._sendone(
+            self.env.ref('base.group_system'),
+            'smobilpay/transaction_state',
+            self._smobilpay_get_ops_event(previous_state),
+        )
+
+    @api.model
+    def smobilpay_get_ops_snapshot(self):
+        """Return the recent SmobilPay state changes seeding the operations dashboard
+
+        Called once when a dashboard is opened; it then follows the bus.
+
+        :return: The window in minutes, the events within it, most recent
+                 first, and the recent confirmation latencies
+        :rtype: dict
+        """
+        if not self.env.user.has_group('base.group_system'):
+            raise AccessError(_("Only administrators can watch SmobilPay operations."))
+        txs = self.sudo().search([
+            ('provider_code', '=', 'smobilpay'),
+            ('company_id', 'in', self.env.companies.ids),
+            ('last_state_change', '>=', fields.Datetime.now() - timedelta(minutes=const.OPS_DASHBOARD_WINDOW)),
+        ], order='last_state_change desc', limit=const.OPS_DASHBOARD_SNAPSHOT_LIMIT)
+        providers = self.env['payment.provider'].sudo().search([
+            ('code', '=', 'smobilpay'), ('company_id', 'in', self.env.companies.ids),
+        ])
+        return {
+            'window': const.OPS_DASHBOARD_WINDOW,
+            'events': [tx._smobilpay_get_ops_event() for tx in txs],
+            'latencies': self.env['smobilpay.latency.sketch'].sudo()._smobilpay_get_latency_report(
+                provider_ids=providers.ids
+            ),
+        }
+
+    @profiling.profiled('payment.transaction._smobilpay_create_payment_request')
+    def _smobilpay_create_payment_request(self, lane='checkout', queue_on_outage=True):
+        """Create payment request with SmobilPay API
+
+        When the API is unreachable and the provider queues payments during
+        outages, the request is stored in `smobilpay.outbox` and sent later.
 
-    def _smobilpay_create_payment_request(self):
-        """Create payment request with SmobilPay API"""
+        :param str lane: The rate limiting priority lane of the call
+        :param bool queue_on_outage: Whether to queue the request if the API is unreachable
+        :return: The SmobilPay payment URL, or None if the request was queued
+        :rtype: str
+        """
         self.ensure_one()
         
         if not self.smobilpay_merchant_reference:
@@ -171,22 +367,192 @@ class PaymentTransaction(models.Model):
             'returnUrl': self._get_return_url(),
         }
         
+        # Repeated calls for the same merchant reference reuse the first order
+        idempotency, cached_response = self.env['smobilpay.idempotency'].sudo()._smobilpay_lock(
+            self.smobilpay_merchant_reference,
+            self.provider_id,
+            self.provider_id.smobilpay_idempotency_ttl or const.IDEMPOTENCY_TTL_MINUTES,
+        )
+        if cached_response:
+            _logger.info(
+                "SmobilPay order for merchant reference %s already created, reusing it",
+                self.smobilpay_merchant_reference
+            )
+            return cached_response['paymentUrl']
+
+        state = utils.get_provider_state(self.provider_id)
+        failures = state.failures
         try:
             # Create payment request via API
             response = self.provider_id._smobilpay_make_request(
-                '/api/order/create', payment_data, 'POST'
+                '/api/order/create', payment_data, 'POST', lane=lane
             )
             
             if response.get('status') == 'success' and response.get('paymentUrl'):
-                self.smobilpay_payment_id = response.get('paymentId', '')
+                idempotency._smobilpay_store({
+                    'paymentUrl': response['paymentUrl'],
+                    'paymentId': response.get('paymentId', ''),
+                })
+                self.write({
+                    'smobilpay_payment_id': response.get('paymentId', ''),
+                    'smobilpay_payment_url': response['paymentUrl'],
+                })
                 return response['paymentUrl']
             else:
                 raise UserError(_("Failed to create SmobilPay payment request"))
                 
+        except psycopg2.OperationalError:
+            # Concurrency errors are retried by Odoo with the whole request
+            raise
         except Exception as e:
             _logger.error("SmobilPay payment creation failed: %s", str(e))
+            if queue_on_outage and self.provider_id.smobilpay_store_and_forward and state.is_failing(failures):
+                self.env['smobilpay.outbox'].sudo()._smobilpay_enqueue(self)
+                self._set_pending()
+                return None
             raise UserError(_("Payment creation failed: %s") % str(e))
 
+    @api.model
+    def _smobilpay_validate_phone(self, phone, method):
+        """Validate the phone number and operator entered in the inline form
+
+        Returns the phone number in E.164 format, or raises ValidationError.
+        """
+        if method not in const.PAYMENT_METHODS:
+            raise ValidationError(_("Please select a valid payment method"))
+
+        clean_phone = utils.normalize_phone(phone)
+        if not clean_phone:
+            raise ValidationError(_("Please enter a valid phone number (9 digits)"))
+
+        return clean_phone
+
+    def _finalize_post_processing(self):
+        """Leave SmobilPay transactions set for batch post-processing to the batch cron"""
+        if self.env.context.get('smobilpay_batch_post_processing'):
+            return super()._finalize_post_processing()
+
+        deferred_txs = self.filtered(
+            lambda tx: tx.provider_code == 'smobilpay' and tx.provider_id.smobilpay_batch_post_processing
+        )
+        return super(PaymentTransaction, self - deferred_txs)._finalize_post_processing()
+
+    @api.model
+    def _cron_smobilpay_batch_post_processing(self, batch_size=const.POST_PROCESSING_BATCH_SIZE):
+        """Post-process the confirmed SmobilPay transactions in batches
+
+        Each batch is finalised with a single call, so that the ORM reads and
+        writes the records of the whole batch together, and committed on its
+        own. If a batch fails, its transactions are retried one by one so that
+        a single faulty transaction does not block the others. Like Odoo's
+        `_cron_finalize_post_processing`, transactions confirmed more than
+        `POST_PROCESSING_RETRY_LIMIT_DAYS` ago are given up on.
+        """
+        retry_limit_date = datetime.utcnow() - timedelta(days=const.POST_PROCESSING_RETRY_LIMIT_DAYS)
+        # The candidates may be selected on the read replica; their state is
+        # checked again on the primary, a lagging replica only delaying them
+        with replica.cursor(self.env.cr.dbname, fallback=self.env.cr) as cr:
+            cr.execute("""
+                SELECT tx.id
+                  FROM payment_transaction tx
+                  JOIN payment_provider provider ON provider.id = tx.provider_id
+                 WHERE provider.code = 'smobilpay'
+                   AND provider.smobilpay_batch_post_processing
+                   AND tx.state = 'done'
+                   AND NOT COALESCE(tx.is_post_processed, FALSE)
+                   AND tx.last_state_change >= %s
+              ORDER BY tx.last_state_change
+            """, [retry_limit_date])
+            tx_ids = [row[0] for row in cr.fetchall()]
+        txs = self.browse(tx_ids).filtered(lambda tx: tx.state == 'done' and not tx.is_post_processed)
+        txs = txs.with_context(smobilpay_batch_post_processing=True)
+
+        for offset in range(0, len(txs), batch_size):
+            batch = txs[offset:offset + batch_size]
+            try:
+                with self.env.cr.savepoint():
+                    batch._finalize_post_processing()
+            except Exception:
+                _logger.exception("SmobilPay: batch post-processing failed, retrying one by one")
+                for tx in batch:
+                    try:
+                        with self.env.cr.savepoint():
+                            tx._finalize_post_processing()
+                    except Exception:
+                        _logger.exception("SmobilPay: post-processing of transaction %s failed", tx.reference)
+            self.env.cr.commit()
+
+    @api.model
+    def _cron_smobilpay_backfill_phone_numbers(self, batch_size=const.BACKFILL_BATCH_SIZE):
+        """Normalise the phone numbers and operators of historic SmobilPay transactions
+
+        Transactions are walked by increasing id in chunks of `batch_size`; each
+        chunk is updated with a single statement and committed together with
+        the checkpoint, so rows are only locked briefly and an interrupted run
+        resumes where it stopped. The cron re-triggers itself until all
+        transactions are processed. Each run lasts at most the
+        `smobilpay_backfill_time_limit` seconds of the server configuration.
+        """
+        checkpoint = self.env['smobilpay.backfill.checkpoint'].sudo()._get('phone_numbers')
+        if checkpoint.done:
+            return
+
+        time_limit = float(config.get('smobilpay_backfill_time_limit') or const.BACKFILL_DEFAULT_TIME_LIMIT)
+        deadline = time.monotonic() + time_limit
+        while time.monotonic() < deadline:
+            self.env.cr.execute("""
+                SELECT tx.id, tx.smobilpay_phone_number, tx.smobilpay_payment_method
+                  FROM payment_transaction tx
+                  JOIN payment_provider provider ON provider.id = tx.provider_id
+                 WHERE provider.code = 'smobilpay' AND tx.id > %s
+              ORDER BY tx.id
+                 LIMIT %s
+            """, [checkpoint.last_id, batch_size])
+            rows = self.env.cr.fetchall()
+            if not rows:
+                checkpoint.done = True
+                self.env.cr.commit()
+                _logger.info(
+                    "SmobilPay phone number backfill done: %s transactions processed, %s updated",
+                    checkpoint.processed_count, checkpoint.updated_count
+                )
+                return
+
+            updates = []
+            for tx_id, phone, method in rows:
+                new_phone = utils.normalize_phone(phone) or phone
+                new_method = method
+                operator = utils.get_phone_operator(new_phone)
+                # `mtn_cm` used to be the default for unknown operators
+                if operator and method in (False, None, 'mtn_cm'):
+                    new_method = operator
+                if (new_phone, new_method) != (phone, method):
+                    updates.append((tx_id, new_phone, new_method))
+
+            if updates:
+                ids, phones, methods = zip(*updates)
+                self.env.cr.execute("""
+                    UPDATE payment_transaction tx
+                       SET smobilpay_phone_number = data.phone,
+                           smobilpay_payment_method = data.method
+                      FROM unnest(%s::int[], %s::varchar[], %s::varchar[]) AS data(id, phone, method)
+                     WHERE tx.id = data.id
+                """, [list(ids), list(phones), list(methods)])
+
+            checkpoint.write({
+                'last_id': rows[-1][0],
+                'processed_count': checkpoint.processed_count + len(rows),
+                'updated_count': checkpoint.updated_count + len(updates),
+            })
+            self.env.cr.commit()
+            _logger.info(
+                "SmobilPay phone number backfill: %s transactions processed up to id %s",
+                checkpoint.processed_count, checkpoint.last_id
+            )
+
+        self.invalidate_model(['smobilpay_phone_number', 'smobilpay_payment_method'])
+        self.env.ref('smobilpay_odoo_gateway.ir_cron_smobilpay_backfill_phone_numbers')._trigger()
+
     def _get_callback_url(self):
         """Generate callback URL for payment notifications"""
         base_url = self.provider_id.get_base_url()
@@ -203,30 +569,52 @@ class PaymentTransaction(models.Model):
             f'/payment/smobilpay/return/{self.smobilpay_merchant_reference}'
         )
 
-    @api.model 
-    def _smobilpay_verify_webhook_signature(self, payload, signature, secret):
-        """Verify webhook signature from SmobilPay"""
-        if not secret:
+    def _smobilpay_verify_webhook_signature(self, payload, signature):
+        """Verify webhook signature from SmobilPay
+
+        The signature is checked against the current webhook secret and,
+        during a rotation, the previous one. Both are always compared in
+        constant time, whichever matches. Unsigned webhooks are accepted only
+        while the provider has no webhook secret; a signature that cannot be
+        checked, for lack of a provider or secret, is rejected.
+
+        :param str payload: The raw webhook body
+        :param str signature: The X-SmobilPay-Signature header
+        :return: Whether the signature was made with an accepted secret
+        :rtype: bool
+        """
+        self.ensure_one()
+        provider = self.provider_id
+        if not provider.smobilpay_webhook_secret:
+            if signature:
+                _logger.warning(
+                    "SmobilPay: signed webhook rejected for transaction %s, no webhook secret configured",
+                    self.reference
+                )
+                return False
             _logger.warning("No webhook secret configured for signature verification")
             return True  # Skip verification if no secret is set
-            
-        expected_signature = hmac.new(
-            secret.encode('utf-8'),
-            payload.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
-        
-        return hmac.compare_digest(signature, expected_signature)
 
-    def _log_received_message(self, message, notification_data):
+        payload = payload.encode('utf-8')
+        signature = signature.encode('utf-8')
+        matched = None
+        for label, mac in provider._smobilpay_get_webhook_macs():
+            mac = mac.copy()
+            mac.update(payload)
+            if hmac.compare_digest(mac.hexdigest().encode('ascii'), signature) and not matched:
+                matched = label
+
+        provider._smobilpay_record_webhook_match(matched or 'invalid')
+        return bool(matched)
+
+    def _log_received_message(self):
         """Override to log SmobilPay specific information"""
-        super()._log_received_message(message, notification_data)
-        
-        if self.provider_code == 'smobilpay' and notification_data:
+        super()._log_received_message()
+        for tx in self.filtered(lambda t: t.provider_code == 'smobilpay'):
             _logger.info(
                 "SmobilPay notification for transaction %s (ref: %s): Status=%s, PaymentID=%s",
-                self.reference,
-                self.smobilpay_merchant_reference,
-                notification_data.get('status', 'Unknown'),
-                notification_data.get('paymentId', 'None')
-            )
\ No newline at end of file
+                tx.reference,
+                tx.smobilpay_merchant_reference,
+                tx.state,
+                tx.smobilpay_payment_id or 'None'
+            )
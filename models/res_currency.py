@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, models
+
+
+class ResCurrency(models.Model):
+    _inherit = 'res.currency'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        currencies = super().create(vals_list)
+        self.env['payment.provider'].clear_caches()
+        return currencies
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'name' in vals:
+            self.env['payment.provider'].clear_caches()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env['payment.provider'].clear_caches()
+        return res
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+
+from odoo import fields, models
+
+
+class SmobilpayBackfillCheckpoint(models.Model):
+    _name = 'smobilpay.backfill.checkpoint'
+    _description = "SmobilPay Backfill Checkpoint"
+
+    name = fields.Char(string="Job", required=True, readonly=True)
+    last_id = fields.Integer(string="Last Processed ID", readonly=True)
+    processed_count = fields.Integer(string="Processed Records", readonly=True)
+    updated_count = fields.Integer(string="Updated Records", readonly=True)
+    done = fields.Boolean(string="Done", readonly=True)
+
+    _sql_constraints = [
+        ('name_uniq', 'UNIQUE(name)', "There is one checkpoint per backfill job."),
+    ]
+
+    def _get(self, name):
+        """Return the checkpoint of the job `name`, creating it if needed"""
+        return self.search([('name', '=', name)], limit=1) or self.create({'name': name})
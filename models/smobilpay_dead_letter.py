@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import random
+from datetime import timedelta
+
+import psycopg2
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError, ValidationError
+
+from odoo.addons.smobilpay_odoo_gateway import const
+
+_logger = logging.getLogger(__name__)
+
+
+class SmobilpayDeadLetter(models.Model):
+    _name = 'smobilpay.dead.letter'
+    _description = "SmobilPay Failed Notification"
+    _order = 'next_retry_date, id'
+
+    route = fields.Selection(
+        string="Received On",
+        selection=[('callback', "Callback"), ('return', "Return"), ('webhook', "Webhook")],
+        required=True,
+        readonly=True,
+    )
+    merchant_reference = fields.Char(string="Merchant Reference", readonly=True, index=True)
+    transaction_id = fields.Many2one('payment.transaction', string="Transaction", readonly=True)
+    payload = fields.Text(string="Notification Data", required=True, readonly=True)
+    error_class = fields.Char(string="Error Class", readonly=True)
+    error_message = fields.Text(string="Error", readonly=True)
+    attempt_count = fields.Integer(string="Attempts", default=1, readonly=True)
+    next_retry_date = fields.Datetime(string="Next Retry", readonly=True, index=True)
+    state = fields.Selection(
+        string="Status",
+        selection=[('pending', "Pending"), ('done', "Processed"), ('abandoned', "Abandoned")],
+        default='pending',
+        required=True,
+        readonly=True,
+        index=True,
+    )
+
+    @api.model
+    def _smobilpay_capture(self, route, notification_data, error, tx=None):
+        """Store a notification whose processing failed, for later retries
+
+        Notifications that cannot succeed, such as malformed ones or those of
+        an unknown reference, are stored as abandoned.
+        """
+        transient = self._smobilpay_is_transient(error)
+        return self.create({
+            'route': route,
+            'merchant_reference': notification_data.get('merchantReference'),
+            'transaction_id': tx.id if tx else False,
+            'payload': json.dumps(notification_data),
+            'error_class': type(error).__name__,
+            'error_message': str(error),
+            'state': 'pending' if transient else 'abandoned',
+            'next_retry_date': transient and self._smobilpay_get_next_retry_date(1),
+        })
+
+    @api.model
+    def _smobilpay_is_transient(self, error):
+        """Tell whether processing the notification again may succeed
+
+        Lock, serialization and connection errors, and the errors of the
+        SmobilPay API, are transient. A `ValidationError` is raised by the
+        parsing of the notification or the lookup of its transaction, and is
+        raised again whatever the number of retries.
+        """
+        if isinstance(error, ValidationError):
+            return False
+        return isinstance(error, (psycopg2.OperationalError, UserError))
+
+    @api.model
+    def _smobilpay_get_next_retry_date(self, attempt_count):
+        """Exponential back-off with jitter, so that retries of a burst of
+        failures do not all hit the database at the same time"""
+        delay = min(const.DEAD_LETTER_BASE_DELAY * 2 ** (attempt_count - 1), const.DEAD_LETTER_MAX_DELAY)
+        return fields.Datetime.now() + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    @api.model
+    def _cron_smobilpay_retry_dead_letters(self, limit=const.DEAD_LETTER_BATCH_SIZE):
+        """Retry the failed notifications that are due
+
+        Each notification is claimed with SKIP LOCKED in its own transaction,
+        which its retry commits: the row stays locked until its outcome is
+        saved, so several workers can share the backlog without retrying the
+        same notification twice.
+        """
+        for _i in range(limit):
+            self.env.cr.execute("""
+                SELECT id
+                  FROM smobilpay_dead_letter
+                 WHERE state = 'pending' AND next_retry_date <= NOW() AT TIME ZONE 'UTC'
+              ORDER BY next_retry_date
+                 LIMIT 1
+                   FOR UPDATE SKIP LOCKED
+            """)
+            row = self.env.cr.fetchone()
+            if not row:
+                break
+            self.browse(row[0])._smobilpay_retry()
+            self.env.cr.commit()
+
+    def _smobilpay_retry(self):
+        """Process the notifications again and update the retry bookkeeping"""
+        for dead_letter in self:
+            try:
+                with self.env.cr.savepoint():
+                    tx = self.env['payment.transaction'].sudo()._handle_notification_data(
+                        'smobilpay', json.loads(dead_letter.payload)
+                    )
+            except Exception as e:
+                attempt_count = dead_letter.attempt_count + 1
+                abandoned = (
+                    attempt_count >= const.DEAD_LETTER_MAX_ATTEMPTS or not self._smobilpay_is_transient(e)
+                )
+                dead_letter.write({
+                    'attempt_count': attempt_count,
+                    'error_class': type(e).__name__,
+                    'error_message': str(e),
+                    'state': 'abandoned' if abandoned else 'pending',
+                    'next_retry_date': False if abandoned else self._smobilpay_get_next_retry_date(attempt_count),
+                })
+                _logger.warning(
+                    "SmobilPay: retry %s of notification %s failed: %s",
+                    attempt_count, dead_letter.merchant_reference, str(e)
+                )
+            else:
+                dead_letter.write({
+                    'state': 'done',
+                    'transaction_id': tx.id,
+                    'next_retry_date': False,
+                })
+                _logger.info("SmobilPay: notification %s processed on retry", dead_letter.merchant_reference)
+
+    def action_retry_now(self):
+        """Retry the selected notifications immediately"""
+        to_retry = self.filtered(lambda d: d.state != 'done')
+        to_retry._smobilpay_retry()
+        retried = len(to_retry.filtered(lambda d: d.state == 'done'))
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _("Retry"),
+                'message': _("%s of %s notifications processed", retried, len(to_retry)),
+                'type': 'success' if retried == len(to_retry) else 'warning',
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            },
+        }
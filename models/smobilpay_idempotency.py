@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class SmobilpayIdempotency(models.Model):
+    _name = 'smobilpay.idempotency'
+    _description = "SmobilPay Idempotency Key"
+    _log_access = False
+
+    key = fields.Char(string="Key", required=True, readonly=True)
+    provider_id = fields.Many2one(
+        'payment.provider', string="Provider", required=True, readonly=True, ondelete='cascade'
+    )
+    response = fields.Text(string="Cached Response", readonly=True)
+    expires_at = fields.Datetime(string="Expires At", required=True, readonly=True, index=True)
+
+    _sql_constraints = [
+        ('key_provider_uniq', 'UNIQUE(key, provider_id)', "An idempotency key must be unique per provider."),
+    ]
+
+    @api.model
+    def _smobilpay_lock(self, key, provider, ttl_minutes):
+        """Fetch and lock the record for `key`, creating it if needed
+
+        The row lock is held until the end of the current transaction, so
+        concurrent calls for the same key wait for the first one to finish
+        and then read its cached response.
+        """
+        expires_at = fields.Datetime.now() + timedelta(minutes=ttl_minutes)
+        self.env.cr.execute("""
+            INSERT INTO smobilpay_idempotency (key, provider_id, expires_at)
+                 VALUES (%s, %s, %s)
+            ON CONFLICT (key, provider_id) DO NOTHING
+        """, [key, provider.id, expires_at])
+        self.env.cr.execute("""
+            SELECT id, response, expires_at
+              FROM smobilpay_idempotency
+             WHERE key = %s AND provider_id = %s
+               FOR UPDATE
+        """, [key, provider.id])
+        record_id, response, record_expires_at = self.env.cr.fetchone()
+
+        record = self.browse(record_id)
+        if response and record_expires_at > fields.Datetime.now():
+            return record, json.loads(response)
+
+        # Missing or stale response: the caller performs the request again
+        self.env.cr.execute(
+            "UPDATE smobilpay_idempotency SET response = NULL, expires_at = %s WHERE id = %s",
+            [expires_at, record_id]
+        )
+        record.invalidate_recordset()
+        return record, None
+
+    def _smobilpay_store(self, response):
+        """Cache the API response on the locked record"""
+        self.ensure_one()
+        self.env.cr.execute(
+            "UPDATE smobilpay_idempotency SET response = %s WHERE id = %s",
+            [json.dumps(response), self.id]
+        )
+        self.invalidate_recordset(['response'])
+
+    @api.autovacuum
+    def _gc_expired_keys(self):
+        """Remove idempotency keys whose cached response has expired"""
+        self.env.cr.execute(
+            "DELETE FROM smobilpay_idempotency WHERE expires_at < %s", [fields.Datetime.now()]
+        )
+        _logger.info("SmobilPay: removed %s expired idempotency keys", self.env.cr.rowcount)
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+from odoo.addons.smobilpay_odoo_gateway import const, replica
+from odoo.addons.smobilpay_odoo_gateway.sketch import LatencySketch
+
+_logger = logging.getLogger(__name__)
+
+
+class SmobilpayLatencySketch(models.Model):
+    """Confirmation latencies of SmobilPay payments, as one quantile sketch
+    per provider, operator and hour.
+
+    Each row is one bucket of a sketch (see `LatencySketch`). Recording a
+    confirmation increments one row, and only confirmations falling in the
+    same bucket in the same hour touch the same row. Quantiles over any
+    period are computed by adding the bucket counts of its hours.
+    """
+    _name = 'smobilpay.latency.sketch'
+    _description = "SmobilPay Confirmation Latency Sketch"
+    _log_access = False
+
+    provider_id = fields.Many2one(
+        'payment.provider', string="Provider", required=True, readonly=True, ondelete='cascade'
+    )
+    operator = fields.Char(string="Operator", required=True, readonly=True)
+    hour = fields.Datetime(string="Hour", required=True, readonly=True)
+    bucket = fields.Integer(string="Bucket", required=True, readonly=True)
+    count = fields.Integer(string="Confirmations", readonly=True)
+
+    _sql_constraints = [
+        ('sketch_bucket_uniq', 'UNIQUE(provider_id, operator, hour, bucket)', "A bucket is unique per sketch."),
+    ]
+
+    @api.model
+    def _smobilpay_record(self, tx):
+        """Count the confirmation latency of `tx`, from its creation to its confirmation"""
+        latency = (tx.last_state_change - tx.create_date).total_seconds()
+        self.env.cr.execute("""
+            INSERT INTO smobilpay_latency_sketch AS sketch (provider_id, operator, hour, bucket, count)
+                 VALUES (%s, %s, date_trunc('hour', %s::timestamp), %s, 1)
+            ON CONFLICT (provider_id, operator, hour, bucket) DO UPDATE
+                    SET count = sketch.count + 1
+        """, [
+            tx.provider_id.id,
+            tx.smobilpay_payment_method or 'unknown',
+            tx.last_state_change,
+            LatencySketch.bucket(latency),
+        ])
+
+    @api.model
+    def _smobilpay_get_sketches(self, date_from, date_to=None, provider_ids=None):
+        """Merge the hourly sketches of a period
+
+        :param datetime date_from: The first hour included
+        :param datetime date_to: The end of the period, excluded; now if not set
+        :param list provider_ids: The providers to include; all if not set
+        :return: The merged sketches, as `{(provider_id, operator): LatencySketch}`
+        :rtype: dict
+        """
+        conditions = ["hour >= date_trunc('hour', %s::timestamp)"]
+        params = [date_from]
+        if date_to:
+            conditions.append("hour < %s")
+            params.append(date_to)
+        if provider_ids:
+            conditions.append("provider_id IN %s")
+            params.append(tuple(provider_ids))
+        with replica.cursor(self.env.cr.dbname, fallback=self.env.cr) as cr:
+            cr.execute(f"""
+                SELECT provider_id, operator, bucket, SUM(count)
+                  FROM smobilpay_latency_sketch
+                 WHERE {' AND '.join(conditions)}
+              GROUP BY provider_id, operator, bucket
+            """, params)
+            rows = cr.fetchall()
+        sketches = {}
+        for provider_id, operator, bucket, count in rows:
+            sketches.setdefault((provider_id, operator), LatencySketch()).buckets[bucket] = count
+        return sketches
+
+    @api.model
+    def _smobilpay_get_quantiles(self, date_from, date_to=None, provider_ids=None):
+        """Return the p50, p95 and p99 confirmation latencies (seconds) of a period
+
+        :return: The quantiles and sample count, per `(provider_id, operator)`
+        :rtype: dict
+        """
+        return {
+            key: {
+                'count': sketch.count,
+                'p50': sketch.quantile(0.5),
+                'p95': sketch.quantile(0.95),
+                'p99': sketch.quantile(0.99),
+            }
+            for key, sketch in self._smobilpay_get_sketches(date_from, date_to, provider_ids).items()
+        }
+
+    @api.model
+    def _smobilpay_get_latency_report(self, provider_ids=None):
+        """Return the recent confirmation latencies, checked against their provider's threshold
+
+        Latencies cover the last `const.LATENCY_ALERT_WINDOW` minutes, extended
+        to the start of the hour. A p95 over the threshold of the provider
+        raises an alert once the sketch holds `const.LATENCY_ALERT_MIN_COUNT`
+        confirmations.
+
+        :return: The quantiles, threshold and alert flag of each provider and operator
+        :rtype: list
+        """
+        date_from = fields.Datetime.now() - timedelta(minutes=const.LATENCY_ALERT_WINDOW)
+        stats = self._smobilpay_get_quantiles(date_from, provider_ids=provider_ids)
+        providers = self.env['payment.provider'].sudo().browse({provider_id for provider_id, _operator in stats})
+
+        latencies = []
+        for (provider_id, operator), quantiles in stats.items():
+            provider = providers.browse(provider_id)
+            threshold = provider.smobilpay_latency_p95_threshold
+            latencies.append(dict(
+                quantiles,
+                provider_id=provider_id,
+                company_id=provider.company_id.id,
+                operator=operator,
+                threshold=threshold,
+                alert=bool(
+                    threshold
+                    and quantiles['count'] >= const.LATENCY_ALERT_MIN_COUNT
+                    and quantiles['p95'] > threshold
+                ),
+            ))
+        return latencies
+
+    @api.model
+    def _cron_smobilpay_check_latency(self):
+        """Log the latency alerts and push the latencies to the operations dashboards"""
+        latencies = self._smobilpay_get_latency_report()
+        for latency in latencies:
+            if latency['alert']:
+                _logger.warning(
+                    "SmobilPay: p95 confirmation latency of %s on provider %s is %.0f s (threshold %s s)",
+                    latency['operator'], latency['provider_id'], latency['p95'], latency['threshold']
+                )
+        if latencies:
+            self.env['bus.bus']._sendone(
+                self.env.ref('base.group_system'), 'smobilpay/latency', {'latencies': latencies}
+            )
+
+    @api.autovacuum
+    def _gc_old_sketches(self):
+        self.env.cr.execute("""
+            DELETE FROM smobilpay_latency_sketch
+             WHERE hour < NOW() AT TIME ZONE 'UTC' - %s * INTERVAL '1 day'
+        """, [const.LATENCY_SKETCH_RETENTION_DAYS])
+        _logger.info("SmobilPay: removed %s old latency sketch buckets", self.env.cr.rowcount)
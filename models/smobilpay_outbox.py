@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo import _, api, fields, models
+
+from odoo.addons.smobilpay_odoo_gateway import const, utils
+
+_logger = logging.getLogger(__name__)
+
+
+class SmobilpayOutbox(models.Model):
+    _name = 'smobilpay.outbox'
+    _description = "SmobilPay Queued Payment Request"
+    _order = 'queued_date, id'
+
+    transaction_id = fields.Many2one(
+        'payment.transaction', string="Transaction", required=True, readonly=True, ondelete='cascade'
+    )
+    provider_id = fields.Many2one(
+        'payment.provider', string="Provider", required=True, readonly=True, ondelete='cascade'
+    )
+    merchant_reference = fields.Char(string="Merchant Reference", readonly=True, index=True)
+    queued_date = fields.Datetime(string="Queued On", required=True, readonly=True)
+    sent_date = fields.Datetime(string="Sent On", readonly=True)
+    attempt_count = fields.Integer(string="Attempts", readonly=True)
+    error_message = fields.Text(string="Last Error", readonly=True)
+    state = fields.Selection(
+        string="Status",
+        selection=[
+            ('queued', "Queued"),
+            ('sent', "Sent"),
+            ('expired', "Expired"),
+            ('failed', "Failed"),
+        ],
+        default='queued',
+        required=True,
+        readonly=True,
+        index=True,
+    )
+
+    _sql_constraints = [
+        ('transaction_uniq', 'UNIQUE(transaction_id)', "A transaction is queued only once."),
+    ]
+
+    @api.model
+    def _smobilpay_enqueue(self, tx):
+        """Queue the creation of the SmobilPay order of `tx` until the API is reachable
+
+        A transaction already queued keeps its place in the queue; one whose
+        queued request expired or failed is queued again.
+        """
+        self.env.cr.execute("""
+            INSERT INTO smobilpay_outbox (
+                transaction_id, provider_id, merchant_reference, queued_date, attempt_count, state,
+                create_uid, create_date, write_uid, write_date
+            ) VALUES (%s, %s, %s, NOW() AT TIME ZONE 'UTC', 0, 'queued',
+                      %s, NOW() AT TIME ZONE 'UTC', %s, NOW() AT TIME ZONE 'UTC')
+            ON CONFLICT (transaction_id) DO UPDATE
+               SET merchant_reference = EXCLUDED.merchant_reference,
+                   queued_date = CASE
+                       WHEN smobilpay_outbox.state = 'queued' THEN smobilpay_outbox.queued_date
+                       ELSE EXCLUDED.queued_date
+                   END,
+                   state = 'queued',
+                   write_date = EXCLUDED.write_date
+        """, [tx.id, tx.provider_id.id, tx.smobilpay_merchant_reference, self.env.uid, self.env.uid])
+        _logger.info(
+            "SmobilPay: API unreachable, order creation for %s queued", tx.smobilpay_merchant_reference
+        )
+
+    @api.model
+    def _cron_smobilpay_drain_outbox(self, limit=const.OUTBOX_BATCH_SIZE):
+        """Forward the queued order creations, in order, once the API is reachable
+
+        Requests older than the TTL of their provider are discarded first.
+        Each provider's queue is then sent in the order it was filled, through
+        the background lane of the rate limiter; it stops at the first request
+        failing for lack of API, to keep that order. Each request is claimed
+        with SKIP LOCKED in its own transaction, which its forwarding commits,
+        so it stays locked until its outcome is saved.
+        """
+        self._smobilpay_expire()
+
+        unavailable_provider_ids = []
+        for _i in range(limit):
+            self.env.cr.execute("""
+                SELECT id
+                  FROM smobilpay_outbox
+                 WHERE state = 'queued' AND provider_id != ALL(%s)
+              ORDER BY queued_date, id
+                 LIMIT 1
+                   FOR UPDATE SKIP LOCKED
+            """, [unavailable_provider_ids])
+            row = self.env.cr.fetchone()
+            if not row:
+                break
+            item = self.browse(row[0])
+            if not item._smobilpay_forward():
+                unavailable_provider_ids.append(item.provider_id.id)
+            self.env.cr.commit()
+
+    def _smobilpay_expire(self):
+        """Discard the queued requests older than the TTL of their provider"""
+        self.env.cr.execute("""
+            UPDATE smobilpay_outbox outbox
+               SET state = 'expired', write_date = NOW() AT TIME ZONE 'UTC'
+              FROM payment_provider provider
+             WHERE provider.id = outbox.provider_id
+               AND outbox.state = 'queued'
+               AND outbox.queued_date < NOW() AT TIME ZONE 'UTC'
+                   - make_interval(mins => COALESCE(provider.smobilpay_outbox_ttl, %s))
+         RETURNING outbox.transaction_id
+        """, [const.OUTBOX_DEFAULT_TTL])
+        txs = self.env['payment.transaction'].browse([row[0] for row in self.env.cr.fetchall()])
+        if not txs:
+            return
+        self.invalidate_model(['state', 'write_date'])
+        txs.filtered(lambda tx: tx.state in const.PAYMENT_REQUEST_STATES)._set_error(
+            _("SmobilPay could not be reached in time, the payment request was discarded.")
+        )
+        _logger.warning("SmobilPay: %s queued payment requests expired", len(txs))
+        self.env.cr.commit()
+
+    def _smobilpay_forward(self):
+        """Send the queued order creation to SmobilPay
+
+        :return: False if the API is still unreachable, True otherwise
+        :rtype: bool
+        """
+        self.ensure_one()
+        tx = self.transaction_id
+        if tx.state not in const.PAYMENT_REQUEST_STATES:
+            self.write({'state': 'failed', 'error_message': _("The transaction is no longer awaiting payment.")})
+            return True
+
+        state = utils.get_provider_state(self.provider_id)
+        failures = state.failures
+        try:
+            with self.env.cr.savepoint():
+                tx._smobilpay_create_payment_request(lane='background', queue_on_outage=False)
+        except Exception as e:
+            if state.is_failing(failures):
+                self.write({'attempt_count': self.attempt_count + 1, 'error_message': str(e)})
+                return False
+            self.write({
+                'state': 'failed',
+                'attempt_count': self.attempt_count + 1,
+                'error_message': str(e),
+            })
+            tx._set_error(_("The payment request could not be created: %s") % str(e))
+            return True
+
+        self.write({
+            'state': 'sent',
+            'attempt_count': self.attempt_count + 1,
+            'sent_date': fields.Datetime.now(),
+            'error_message': False,
+        })
+        _logger.info("SmobilPay: queued order creation for %s forwarded", self.merchant_reference)
+        return True
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+
+from odoo import fields, models
+
+
+class SmobilpayProfileTrace(models.Model):
+    _name = 'smobilpay.profile.trace'
+    _description = "SmobilPay Profiling Trace"
+    _order = 'duration_ms desc'
+    _log_access = False
+
+    name = fields.Char(string="Entry Point", required=True, readonly=True)
+    create_date = fields.Datetime(string="Recorded On", readonly=True)
+    duration_ms = fields.Float(string="Total (ms)", readonly=True, digits=(16, 1))
+    sql_ms = fields.Float(string="SQL (ms)", readonly=True, digits=(16, 1))
+    http_ms = fields.Float(string="Outbound HTTP (ms)", readonly=True, digits=(16, 1))
+    python_ms = fields.Float(string="Python (ms)", readonly=True, digits=(16, 1))
+    query_count = fields.Integer(string="Queries", readonly=True)
+    http_count = fields.Integer(string="HTTP Calls", readonly=True)
+    spans = fields.Text(string="Nested Calls", readonly=True)
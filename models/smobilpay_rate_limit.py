@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+
+from odoo import fields, models
+
+
+class SmobilpayRateLimit(models.Model):
+    _name = 'smobilpay.rate.limit'
+    _description = "SmobilPay API Rate Limit Bucket"
+    _log_access = False
+
+    provider_id = fields.Many2one(
+        'payment.provider', string="Provider", required=True, readonly=True, ondelete='cascade'
+    )
+    tokens = fields.Float(string="Available Tokens", readonly=True)
+    updated_at = fields.Datetime(string="Last Refill", readonly=True)
+    blocked_until = fields.Datetime(
+        string="Blocked Until", help="Set from the Retry-After header of HTTP 429 responses", readonly=True
+    )
+
+    _sql_constraints = [
+        ('provider_uniq', 'UNIQUE(provider_id)', "There is one rate limit bucket per provider."),
+    ]
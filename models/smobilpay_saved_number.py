@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+
+
+class SmobilpaySavedNumber(models.Model):
+    _name = 'smobilpay.saved.number'
+    _description = "SmobilPay Saved Mobile Money Number"
+    _order = 'last_used_date desc'
+    _log_access = False
+
+    partner_id = fields.Many2one(
+        'res.partner', string="Customer", required=True, readonly=True, index=True, ondelete='cascade'
+    )
+    phone_number = fields.Char(string="Phone Number", required=True, readonly=True)
+    payment_method = fields.Selection(
+        selection=[
+            ('mtn_cm', 'MTN Mobile Money'),
+            ('orange_cm', 'Orange Mobile Money'),
+            ('express_union', 'Express Union Mobile Money'),
+            ('smobilpay_cash', 'SmobilPay Cash'),
+        ],
+        string="Payment Method",
+        readonly=True,
+    )
+    last_used_date = fields.Datetime(string="Last Used", readonly=True)
+
+    _sql_constraints = [
+        ('partner_phone_uniq', 'UNIQUE(partner_id, phone_number)', "A number is saved once per customer."),
+    ]
+
+    @api.model
+    def _smobilpay_save(self, partner, phone_number, payment_method):
+        """Save a number that completed a payment, or mark it as used again"""
+        self.env.cr.execute("""
+            INSERT INTO smobilpay_saved_number (partner_id, phone_number, payment_method, last_used_date)
+                 VALUES (%s, %s, %s, NOW() AT TIME ZONE 'UTC')
+            ON CONFLICT (partner_id, phone_number) DO UPDATE
+                    SET payment_method = COALESCE(EXCLUDED.payment_method, smobilpay_saved_number.payment_method),
+                        last_used_date = EXCLUDED.last_used_date
+        """, [partner.id, phone_number, payment_method or None])
+
+    @api.model
+    def _smobilpay_get_inline_form_values(self, limit=5):
+        """Return the numbers of the logged-in customer that pre-fill the inline form
+
+        Only the numbers of the current user's partner are returned, never those
+        of the partner a payment link was issued for, so that anyone opening the
+        link cannot see them; public users get none.
+
+        :return: The `saved_numbers` offered, most recently used first, and the
+                 `default_phone` and `default_method` of the last one used
+        :rtype: dict
+        """
+        values = {'saved_numbers': [], 'default_phone': None, 'default_method': None}
+        if self.env.user._is_public():
+            return values
+
+        self.env.cr.execute("""
+              SELECT phone_number, payment_method
+                FROM smobilpay_saved_number
+               WHERE partner_id = %s
+            ORDER BY last_used_date DESC
+               LIMIT %s
+        """, [self.env.user.partner_id.id, limit])
+        rows = self.env.cr.fetchall()
+        if rows:
+            # The form takes the 9-digit local number
+            values.update({
+                'saved_numbers': [phone_number[-9:] for phone_number, _method in rows],
+                'default_phone': rows[0][0][-9:],
+                'default_method': rows[0][1],
+            })
+        return values
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo import api, fields, models
+
+from odoo.addons.smobilpay_odoo_gateway import const
+
+_logger = logging.getLogger(__name__)
+
+
+class SmobilpayVelocityCounter(models.Model):
+    """Payment attempts and amounts per phone number, customer and IP address,
+    counted in fixed-size time buckets.
+
+    A sliding window is the sum of the few buckets it covers, so checking a
+    limit reads a bounded number of rows through the unique index instead of
+    aggregating `payment.transaction`.
+    """
+    _name = 'smobilpay.velocity.counter'
+    _description = "SmobilPay Velocity Counter"
+    _log_access = False
+
+    key_type = fields.Selection(
+        string="Counted By",
+        selection=[('phone', "Phone Number"), ('partner', "Customer"), ('ip', "IP Address")],
+        required=True,
+        readonly=True,
+    )
+    key = fields.Char(string="Key", required=True, readonly=True)
+    bucket_start = fields.Datetime(string="Bucket Start", required=True, readonly=True)
+    attempts = fields.Integer(string="Attempts", readonly=True)
+    amount = fields.Float(string="Amount", readonly=True)
+
+    _sql_constraints = [
+        ('key_bucket_uniq', 'UNIQUE(key_type, key, bucket_start)', "A bucket is unique per key."),
+    ]
+
+    @api.model
+    def _smobilpay_increment(self, keys, amount):
+        """Count one attempt of `amount` for each `(key_type, key)` of `keys`"""
+        keys = [(key_type, str(key)) for key_type, key in keys if key]
+        if not keys:
+            return
+        key_types, key_values = zip(*keys)
+        self.env.cr.execute("""
+            INSERT INTO smobilpay_velocity_counter AS counter (key_type, key, bucket_start, attempts, amount)
+                 SELECT data.key_type, data.key,
+                        TO_TIMESTAMP(FLOOR(EXTRACT(EPOCH FROM NOW()) / %(size)s) * %(size)s) AT TIME ZONE 'UTC',
+                        1, %(amount)s
+                   FROM unnest(%(key_types)s::varchar[], %(keys)s::varchar[]) AS data(key_type, key)
+            ON CONFLICT (key_type, key, bucket_start) DO UPDATE
+                    SET attempts = counter.attempts + 1,
+                        amount = counter.amount + EXCLUDED.amount
+        """, {
+            'size': const.VELOCITY_BUCKET_SIZE,
+            'amount': amount,
+            'key_types': list(key_types),
+            'keys': list(key_values),
+        })
+
+    @api.model
+    def _smobilpay_get_totals(self, keys, window):
+        """Return the attempts and amount of each key over the last `window` minutes
+
+        :return: The totals, as `{(key_type, key): (attempts, amount)}`
+        :rtype: dict
+        """
+        keys = [(key_type, str(key)) for key_type, key in keys if key]
+        if not keys:
+            return {}
+        key_types, key_values = zip(*keys)
+        self.env.cr.execute("""
+            SELECT counter.key_type, counter.key, SUM(counter.attempts), SUM(counter.amount)
+              FROM smobilpay_velocity_counter counter
+              JOIN unnest(%(key_types)s::varchar[], %(keys)s::varchar[]) AS data(key_type, key)
+                ON counter.key_type = data.key_type AND counter.key = data.key
+             WHERE counter.bucket_start > NOW() AT TIME ZONE 'UTC' - %(window)s * INTERVAL '1 minute'
+          GROUP BY counter.key_type, counter.key
+        """, {'key_types': list(key_types), 'keys': list(key_values), 'window': window})
+        return {(key_type, key): (attempts, amount) for key_type, key, attempts, amount in self.env.cr.fetchall()}
+
+    @api.autovacuum
+    def _gc_old_buckets(self):
+        self.env.cr.execute("""
+            DELETE FROM smobilpay_velocity_counter
+             WHERE bucket_start < NOW() AT TIME ZONE 'UTC' - %s * INTERVAL '1 second'
+        """, [const.VELOCITY_RETENTION])
+        _logger.info("SmobilPay: removed %s old velocity buckets", self.env.cr.rowcount)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+from typing import NamedTuple
+
+from odoo.exceptions import ValidationError
+
+from odoo.addons.smobilpay_odoo_gateway import const, utils
+
+
+class SmobilpayNotification(NamedTuple):
+    """Normalised SmobilPay notification, whatever route it was received on
+
+    Callbacks, customer returns and webhooks carry the same information under
+    slightly different shapes; `parse` turns any of them into this object in a
+    single pass over the payload.
+    """
+
+    merchant_reference: str
+    payment_id: str
+    status: str
+    state: str
+    status_message: str
+    phone_number: str
+    payment_method: str
+
+    @classmethod
+    def parse(cls, data):
+        """Validate and normalise a notification payload
+
+        All fields are optional strings, except the merchant reference which
+        is required; the payment id may also be sent as an integer.
+
+        :param dict data: The notification data sent by SmobilPay
+        :return: The parsed notification
+        :rtype: SmobilpayNotification
+        :raise ValidationError: If the payload has no merchant reference or a
+                                field of the wrong type
+        """
+        if not isinstance(data, dict):
+            raise ValidationError("SmobilPay: Notification data must be an object")
+        get = data.get
+        merchant_reference = get('merchantReference') or get('reference')
+        if not merchant_reference:
+            raise ValidationError("SmobilPay: Missing merchant reference in notification data")
+        payment_id = get('paymentId') or ''
+        if type(payment_id) is int:
+            payment_id = str(payment_id)
+        status_message = get('statusMessage') or ''
+        if not (type(merchant_reference) is str and type(payment_id) is str and type(status_message) is str):
+            cls._raise_invalid_field(data)
+
+        # The other fields are checked by the string methods applied to them
+        try:
+            status = (get('status') or '').upper()
+            raw_phone = get('phoneNumber')
+            phone_number = raw_phone and (utils.normalize_phone(raw_phone) or raw_phone)
+            payment_method = get('paymentMethod')
+            if payment_method:
+                # Unknown methods are derived from the phone number rather than defaulted
+                payment_method = (
+                    const.PAYMENT_METHOD_MAPPING.get(payment_method.upper())
+                    or utils.get_phone_operator(phone_number)
+                )
+        except (AttributeError, TypeError):
+            # TypeError: an unhashable phone number cannot be looked up in the cache
+            cls._raise_invalid_field(data)
+
+        # Built positionally, as the keyword constructor of NamedTuple is slower
+        return tuple.__new__(cls, (
+            merchant_reference,
+            payment_id,
+            status,
+            const.STATUS_MAPPING.get(status, 'pending'),
+            status_message,
+            phone_number or None,
+            payment_method or None,
+        ))
+
+    @staticmethod
+    def _raise_invalid_field(data):
+        for key in const.NOTIFICATION_FIELDS:
+            value = data.get(key)
+            if value and type(value) is not str and not (key == 'paymentId' and type(value) is int):
+                raise ValidationError(
+                    f"SmobilPay: Invalid {key} in notification data: expected a string, "
+                    f"got {type(value).__name__}"
+                )
+        raise ValidationError("SmobilPay: Invalid notification data")
+
+    def get_tx_values(self):
+        """Return the `payment.transaction` values carried by the notification"""
+        values = {'smobilpay_status_details': self.status_message}
+        if self.payment_id:
+            values['smobilpay_payment_id'] = self.payment_id
+        if self.phone_number:
+            values['smobilpay_phone_number'] = self.phone_number
+        if self.payment_method:
+            values['smobilpay_payment_method'] = self.payment_method
+        return values
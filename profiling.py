@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+import functools
+import json
+import logging
+import random
+import threading
+import time
+
+from odoo import models
+from odoo.http import request
+
+from odoo.addons.smobilpay_odoo_gateway import const
+
+_logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class Trace:
+    """Timing breakdown of one profiled call and of the calls it makes"""
+
+    def __init__(self, name):
+        self.name = name
+        self.spans = {}
+        self.http_time = 0.0
+        self.http_count = 0
+        current_thread = threading.current_thread()
+        self._start = time.perf_counter()
+        self._query_count = getattr(current_thread, 'query_count', 0)
+        self._query_time = getattr(current_thread, 'query_time', 0.0)
+
+    def add_span(self, name, duration):
+        total, count = self.spans.get(name, (0.0, 0))
+        self.spans[name] = (total + duration, count + 1)
+
+    def stop(self):
+        current_thread = threading.current_thread()
+        self.duration = time.perf_counter() - self._start
+        self.query_count = getattr(current_thread, 'query_count', 0) - self._query_count
+        self.sql_time = getattr(current_thread, 'query_time', 0.0) - self._query_time
+        self.python_time = max(self.duration - self.sql_time - self.http_time, 0.0)
+
+
+def record_http(duration):
+    """Account an outbound HTTP call to the trace being recorded, if any"""
+    trace = getattr(_local, 'trace', None)
+    if trace is not None:
+        trace.http_time += duration
+        trace.http_count += 1
+
+
+def profiled(name):
+    """Profile the decorated method for a sample of its calls
+
+    Works on model methods and controller routes. Calls made while another
+    profiled call is running are recorded as spans of the outer trace.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            trace = getattr(_local, 'trace', None)
+            if trace is not None:
+                start = time.perf_counter()
+                try:
+                    return func(self, *args, **kwargs)
+                finally:
+                    trace.add_span(name, time.perf_counter() - start)
+
+            env = self.env if isinstance(self, models.BaseModel) else request.env
+            if not _is_sampled(env):
+                return func(self, *args, **kwargs)
+
+            trace = _local.trace = Trace(name)
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                _local.trace = None
+                trace.stop()
+                _store(env, trace)
+        return wrapper
+    return decorator
+
+
+def _is_sampled(env):
+    ICP = env['ir.config_parameter'].sudo()
+    if not ICP.get_param(const.PROFILING_ENABLED_PARAM):
+        return False
+    sample_rate = float(ICP.get_param(
+        const.PROFILING_SAMPLE_RATE_PARAM, const.PROFILING_DEFAULT_SAMPLE_RATE
+    ))
+    return random.random() < sample_rate
+
+
+def _store(env, trace):
+    """Save the trace, keeping only the slowest ones
+
+    A separate cursor is used so the trace survives a rollback of the
+    profiled request and does not count in its own queries.
+    """
+    try:
+        keep = int(env['ir.config_parameter'].sudo().get_param(
+            const.PROFILING_KEEP_PARAM, const.PROFILING_DEFAULT_KEEP
+        ))
+        spans = {
+            name: {'duration_ms': round(total * 1000, 2), 'calls': count}
+            for name, (total, count) in trace.spans.items()
+        }
+        with env.registry.cursor() as cr:
+            cr.execute("""
+                INSERT INTO smobilpay_profile_trace (
+                    name, duration_ms, sql_ms, http_ms, python_ms, query_count, http_count, spans, create_date
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW() AT TIME ZONE 'UTC')
+            """, [
+                trace.name,
+                trace.duration * 1000,
+                trace.sql_time * 1000,
+                trace.http_time * 1000,
+                trace.python_time * 1000,
+                trace.query_count,
+                trace.http_count,
+                json.dumps(spans),
+            ])
+            cr.execute("""
+                DELETE FROM smobilpay_profile_trace
+                 WHERE id IN (
+                     SELECT id FROM smobilpay_profile_trace ORDER BY duration_ms DESC OFFSET %s
+                 )
+            """, [keep])
+    except Exception:
+        _logger.exception("SmobilPay: failed to store profiling trace %s", trace.name)
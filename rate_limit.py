@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import odoo
+from odoo import _
+from odoo.exceptions import UserError
+
+from odoo.addons.smobilpay_odoo_gateway import const, utils
+
+_logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Token bucket shared by all workers and shared by all Odoo servers using
+    the same database, stored in the `smobilpay_rate_limit` table.
+
+    Every acquisition runs in its own short transaction, so the bucket row is
+    only locked for the duration of two statements and never for the duration
+    of the caller's transaction.
+    """
+
+    def __init__(self, provider):
+        self.dbname = provider.env.cr.dbname
+        self.provider_id = provider.id
+        self.rate = provider.smobilpay_rate_limit
+        self.burst = max(provider.smobilpay_rate_burst, 1)
+        # Per-worker state of the provider, which remembers the Retry-After of
+        # SmobilPay for all the calls of the worker
+        self.state = utils.get_provider_state(provider)
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def try_acquire(self, lane):
+        """Take a token from the bucket if the lane is allowed to
+
+        :param str lane: The priority lane of the call, see `const.RATE_LIMIT_LANE_RESERVE`
+        :return: 0 if a token was taken, else the estimated seconds to wait
+        :rtype: float
+        """
+        blocked_for = self.state.blocked_until - time.monotonic()
+        if blocked_for > 0:
+            return blocked_for
+        if not self.enabled:
+            return 0
+        # A bucket too small for the reserve of the lane does not starve it
+        required = min(1 + const.RATE_LIMIT_LANE_RESERVE[lane] * self.burst, self.burst)
+        with odoo.registry(self.dbname).cursor() as cr:
+            cr.execute("""
+                INSERT INTO smobilpay_rate_limit (provider_id, tokens, updated_at)
+                     VALUES (%s, %s, clock_timestamp() AT TIME ZONE 'UTC')
+                ON CONFLICT (provider_id) DO NOTHING
+            """, [self.provider_id, self.burst])
+            cr.execute("""
+                SELECT id,
+                       tokens,
+                       EXTRACT(EPOCH FROM (clock_timestamp() AT TIME ZONE 'UTC') - updated_at),
+                       EXTRACT(EPOCH FROM blocked_until - (clock_timestamp() AT TIME ZONE 'UTC'))
+                  FROM smobilpay_rate_limit
+                 WHERE provider_id = %s
+                   FOR UPDATE
+            """, [self.provider_id])
+            bucket_id, tokens, elapsed, blocked_for = cr.fetchone()
+            if blocked_for and blocked_for > 0:
+                return float(blocked_for)
+
+            available = min(self.burst, tokens + max(float(elapsed), 0) * self.rate)
+            if available >= required:
+                available -= 1
+                wait = 0
+            else:
+                wait = (required - available) / self.rate
+            cr.execute("""
+                UPDATE smobilpay_rate_limit
+                   SET tokens = %s, updated_at = clock_timestamp() AT TIME ZONE 'UTC'
+                 WHERE id = %s
+            """, [available, bucket_id])
+        return wait
+
+    def acquire(self, lane):
+        """Wait until a token is available for the lane
+
+        :raise UserError: If no token became available within the lane's timeout
+        """
+        deadline = time.monotonic() + const.RATE_LIMIT_LANE_TIMEOUT[lane]
+        while True:
+            wait = self.try_acquire(lane)
+            if not wait:
+                return
+            if time.monotonic() + wait > deadline:
+                raise UserError(_("SmobilPay API rate limit reached, please try again in a moment"))
+            time.sleep(min(wait, 1))
+
+    def block(self, seconds):
+        """Stop all calls of the provider for `seconds`, after an HTTP 429
+
+        The calls of this worker wait even when rate limiting is disabled;
+        the calls of other workers only when it is enabled.
+        """
+        _logger.warning("SmobilPay: provider %s rate limited for %s seconds", self.provider_id, seconds)
+        with self.state.lock:
+            self.state.blocked_until = max(self.state.blocked_until, time.monotonic() + seconds)
+        if not self.enabled:
+            return
+        with odoo.registry(self.dbname).cursor() as cr:
+            cr.execute("""
+                UPDATE smobilpay_rate_limit
+                   SET blocked_until = GREATEST(
+                           COALESCE(blocked_until, clock_timestamp() AT TIME ZONE 'UTC'),
+                           clock_timestamp() AT TIME ZONE 'UTC' + %s * INTERVAL '1 second'
+                       )
+                 WHERE provider_id = %s
+            """, [seconds, self.provider_id])
+
+
+def parse_retry_after(value):
+    """Return the number of seconds to wait from a Retry-After header
+
+    The header holds either a number of seconds or an HTTP date.
+    """
+    if not value:
+        return const.RATE_LIMIT_DEFAULT_RETRY_AFTER
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return const.RATE_LIMIT_DEFAULT_RETRY_AFTER
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import psycopg2
+
+import odoo
+from odoo import sql_db
+from odoo.tools import config
+
+from odoo.addons.smobilpay_odoo_gateway import const
+
+_logger = logging.getLogger(__name__)
+
+# Replica lag (seconds) last measured by this worker, per replica URI:
+# {uri: (measured_at, lag)}, the lag being None when the replica was unreachable
+_replica_lags = {}
+
+
+def get_replica_uri(dbname):
+    """Return the URI of the read replica of `dbname`, or None if none is configured
+
+    The replica is set by the `smobilpay_replica_uri` option of the server
+    configuration file, e.g. `postgresql://odoo_ro@replica:5432/`. When the
+    URI names no database, the database of the same name as `dbname` is used.
+    """
+    uri = config.get('smobilpay_replica_uri')
+    if not uri:
+        return None
+    if urlsplit(uri).path.strip('/'):
+        return uri
+    return f"{uri.rstrip('/')}/{dbname}"
+
+
+def _get_max_lag():
+    return float(config.get('smobilpay_replica_max_lag') or const.REPLICA_DEFAULT_MAX_LAG)
+
+
+def _measure_lag(cr):
+    """Return how many seconds the replica reached by `cr` is behind its primary"""
+    cr.execute("""
+        SELECT CASE
+                   WHEN NOT pg_is_in_recovery() THEN 0
+                   WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                   ELSE COALESCE(
+                       EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp())::float8,
+                       'Infinity'::float8
+                   )
+               END
+    """)
+    return cr.fetchone()[0]
+
+
+def _get_replica_cursor(dbname):
+    """Return a cursor on the replica of `dbname`, or None if it should not be used
+
+    The replica is not used while its last measured lag exceeds the maximum,
+    or for `const.REPLICA_LAG_CHECK_INTERVAL` seconds after it was found
+    unreachable. The lag is measured again once that interval has passed.
+    """
+    uri = get_replica_uri(dbname)
+    if not uri:
+        return None
+
+    measured_at, lag = _replica_lags.get(uri, (0.0, None))
+    measured = time.monotonic() - measured_at < const.REPLICA_LAG_CHECK_INTERVAL
+    if measured and (lag is None or lag > _get_max_lag()):
+        return None
+
+    try:
+        cr = sql_db.db_connect(uri, allow_uri=True).cursor()
+    except psycopg2.Error as e:
+        _replica_lags[uri] = (time.monotonic(), None)
+        _logger.warning("SmobilPay: read replica unreachable, using the primary: %s", e)
+        return None
+    if measured:
+        return cr
+
+    try:
+        lag = _measure_lag(cr)
+        cr.rollback()
+    except psycopg2.Error as e:
+        cr.close()
+        _replica_lags[uri] = (time.monotonic(), None)
+        _logger.warning("SmobilPay: read replica lag could not be measured, using the primary: %s", e)
+        return None
+    _replica_lags[uri] = (time.monotonic(), lag)
+    if lag > _get_max_lag():
+        cr.close()
+        _logger.warning("SmobilPay: read replica is %.1f s behind, using the primary", lag)
+        return None
+    return cr
+
+
+@contextmanager
+def cursor(dbname, fallback=None):
+    """Yield a cursor for read-only reporting queries on `dbname`
+
+    The read replica is used when one is configured and it is no more than
+    `smobilpay_replica_max_lag` seconds behind the primary (see the server
+    configuration). Otherwise the queries run on the primary: through
+    `fallback` when given, else through a new read-only transaction.
+
+    :param str dbname: The database queried
+    :param fallback: The cursor used when the replica cannot be, usually `env.cr`
+    """
+    cr = _get_replica_cursor(dbname)
+    if cr is None and fallback is not None:
+        yield fallback
+        return
+    if cr is None:
+        cr = odoo.registry(dbname).cursor()
+    with cr:
+        cr.execute("SET TRANSACTION READ ONLY")
+        yield cr
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+import math
+
+from odoo.addons.smobilpay_odoo_gateway import const
+
+_GAMMA = (1 + const.LATENCY_SKETCH_ACCURACY) / (1 - const.LATENCY_SKETCH_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+class LatencySketch:
+    """Mergeable quantile sketch with a bounded relative error (DDSketch)
+
+    Values are counted in buckets whose bounds grow geometrically, so any
+    quantile is estimated within `const.LATENCY_SKETCH_ACCURACY` of its true
+    value while only a few hundred buckets cover milliseconds to days.
+    Merging two sketches adds their bucket counts, which is what lets hourly
+    sketches be stored as counters and combined over any period.
+    """
+
+    def __init__(self, buckets=None):
+        self.buckets = dict(buckets or {})
+
+    @staticmethod
+    def bucket(value):
+        """Return the bucket counting `value`, in seconds"""
+        return math.ceil(math.log(max(value, const.LATENCY_SKETCH_MIN_VALUE)) / _LOG_GAMMA)
+
+    @staticmethod
+    def bucket_value(bucket):
+        """Return the value representing `bucket`, within the accuracy of all its values"""
+        return 2 * _GAMMA ** bucket / (_GAMMA + 1)
+
+    @property
+    def count(self):
+        return sum(self.buckets.values())
+
+    def add(self, value, count=1):
+        bucket = self.bucket(value)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+
+    def merge(self, other):
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+
+    def quantile(self, q):
+        """Return the estimated `q` quantile (0 <= q <= 1), or None if the sketch is empty"""
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                return self.bucket_value(bucket)
+        return self.bucket_value(max(self.buckets))
@@ -0,0 +1,136 @@
+/** @odoo-module **/
+
+import { registry } from "@web/core/registry";
+import { useService } from "@web/core/utils/hooks";
+import { Component, onWillStart, onWillUnmount, useState } from "@odoo/owl";
+
+const OPERATORS = {
+    mtn_cm: 'MTN Mobile Money',
+    orange_cm: 'Orange Mobile Money',
+    express_union: 'Express Union',
+    smobilpay_cash: 'SmobilPay Cash',
+    unknown: 'Unknown',
+};
+
+// Minutes over which the rates and error spikes are measured
+const RATE_MINUTES = 5;
+
+// Failures in the rate period, and share of failed outcomes, flagging a spike
+const SPIKE_MIN_FAILURES = 5;
+const SPIKE_FAILURE_RATIO = 0.3;
+
+const FAILED_STATES = ['error', 'cancel'];
+
+/**
+ * Live SmobilPay operations, aggregated in the browser from the transaction
+ * state changes pushed on the bus: the server is queried once, on opening.
+ */
+export class SmobilpayOpsDashboard extends Component {
+    setup() {
+        this.orm = useService("orm");
+        this.busService = useService("bus_service");
+        this.user = useService("user");
+        this.state = useState({ events: [], latencies: [], window: 15, now: Date.now() });
+
+        onWillStart(async () => {
+            const snapshot = await this.orm.call("payment.transaction", "smobilpay_get_ops_snapshot", []);
+            this.state.window = snapshot.window;
+            this.state.events = snapshot.events.map(parseEvent).reverse();
+            this.state.latencies = snapshot.latencies;
+        });
+
+        this.onNotification = this.onNotification.bind(this);
+        this.busService.addEventListener("notification", this.onNotification);
+        const timer = setInterval(() => this.prune(), 10000);
+        onWillUnmount(() => {
+            this.busService.removeEventListener("notification", this.onNotification);
+            clearInterval(timer);
+        });
+    }
+
+    onNotification({ detail: notifications }) {
+        const companyIds = this.user.context.allowed_company_ids || [];
+        for (const { type, payload } of notifications) {
+            if (type === 'smobilpay/transaction_state' && companyIds.includes(payload.company_id)) {
+                this.state.events.push(parseEvent(payload));
+            } else if (type === 'smobilpay/latency') {
+                this.state.latencies = payload.latencies.filter(
+                    (latency) => companyIds.includes(latency.company_id)
+                );
+            }
+        }
+        this.prune();
+    }
+
+    /**
+     * Drop the events that left the window
+     */
+    prune() {
+        this.state.now = Date.now();
+        const since = this.state.now - this.state.window * 60000;
+        const index = this.state.events.findIndex((event) => event.time >= since);
+        if (index !== 0) {
+            this.state.events.splice(0, index === -1 ? this.state.events.length : index);
+        }
+    }
+
+    get operators() {
+        const rateSince = this.state.now - RATE_MINUTES * 60000;
+        const stats = {};
+        for (const event of this.state.events) {
+            const stat = stats[event.operator] ||= {
+                key: event.operator,
+                name: OPERATORS[event.operator] || event.operator,
+                done: 0, pending: 0, failed: 0, amount: 0, recentDone: 0, recentFailed: 0,
+            };
+            if (event.state === 'done') {
+                stat.done++;
+                stat.amount += event.amount;
+                stat.recentDone += event.time >= rateSince ? 1 : 0;
+            } else if (FAILED_STATES.includes(event.state)) {
+                stat.failed++;
+                stat.recentFailed += event.time >= rateSince ? 1 : 0;
+            } else if (event.state === 'pending') {
+                stat.pending++;
+            }
+        }
+        return Object.values(stats).map((stat) => {
+            const outcomes = stat.recentDone + stat.recentFailed;
+            const failureRatio = outcomes ? stat.recentFailed / outcomes : 0;
+            return Object.assign(stat, {
+                confirmationsPerMinute: (stat.recentDone / RATE_MINUTES).toFixed(1),
+                failurePercent: Math.round(failureRatio * 100),
+                spike: stat.recentFailed >= SPIKE_MIN_FAILURES && failureRatio >= SPIKE_FAILURE_RATIO,
+            });
+        });
+    }
+
+    get latencies() {
+        return this.state.latencies.map((latency) => Object.assign({}, latency, {
+            key: `${latency.provider_id}-${latency.operator}`,
+            operatorName: OPERATORS[latency.operator] || latency.operator,
+            p50: Math.round(latency.p50),
+            p95: Math.round(latency.p95),
+            p99: Math.round(latency.p99),
+        }));
+    }
+
+    get recentEvents() {
+        return this.state.events.slice(-20).reverse();
+    }
+
+    get rateMinutes() {
+        return RATE_MINUTES;
+    }
+}
+
+function parseEvent(payload) {
+    return Object.assign({}, payload, {
+        time: payload.date ? new Date(payload.date.replace(' ', 'T') + 'Z').getTime() : Date.now(),
+        operatorName: OPERATORS[payload.operator] || payload.operator,
+    });
+}
+
+SmobilpayOpsDashboard.template = "smobilpay_odoo_gateway.OpsDashboard";
+
+registry.category("actions").add("smobilpay_ops_dashboard", SmobilpayOpsDashboard);
@@ -1,299 +1,352 @@
-/* global $ */
-odoo.define('smobilpay_odoo_gateway.payment_form', function (require) {
-    'use strict';
+/** @odoo-module **/
 
-    const core = require('web.core');
-    const Dialog = require('web.Dialog');
-    const publicWidget = require('web.public.widget');
+import { translatedTerms } from "@web/core/l10n/translation";
 
-    const _t = core._t;
+const _t = (str) => translatedTerms[str] || str;
+
+const SUBMIT_SELECTOR = 'button[type="submit"], input[type="submit"]';
+
+const METHOD_INFO = {
+    mtn_cm: { name: 'MTN Mobile Money', prefix: '67, 68' },
+    orange_cm: { name: 'Orange Mobile Money', prefix: '69, 65' },
+    express_union: { name: 'Express Union', prefix: '67, 68, 69' },
+    smobilpay_cash: { name: 'SmobilPay Cash', prefix: 'Any number' },
+};
+
+/**
+ * Check if it's a valid Cameroon phone number (9 digits)
+ */
+export function validatePhone(phone) {
+    // Remove spaces and special characters
+    const cleanPhone = (phone || '').replace(/[\s\-\(\)]/g, '');
+    return /^[0-9]{9}$/.test(cleanPhone);
+}
+
+/**
+ * Show field-specific error
+ */
+function showFieldError(field, message) {
+    field.classList.add('smobilpay-error');
+    clearFieldMessage(field);
+
+    const error = document.createElement('div');
+    error.className = 'smobilpay-error-message';
+    error.textContent = message;
+    field.parentElement.appendChild(error);
+}
+
+/**
+ * Clear field error
+ */
+function clearFieldError(field) {
+    field.classList.remove('smobilpay-error');
+    clearFieldMessage(field);
+}
+
+function clearFieldMessage(field) {
+    const existing = field.parentElement.querySelector('.smobilpay-error-message');
+    if (existing) {
+        existing.remove();
+    }
+}
+
+/**
+ * SmobilPay Payment Form
+ */
+export class SmobilpayPaymentForm {
+    static selector = '.smobilpay-payment-form';
+
+    constructor(el) {
+        this.el = el;
+        // The checkout form of the payment module, which holds the Pay button
+        this.form = el.closest('form') || el;
+        this.phoneInput = el.querySelector('#smobilpay_phone');
+        this.methodSelect = el.querySelector('#smobilpay_method');
+
+        // Add validation attributes
+        this.phoneInput.setAttribute('pattern', '[0-9]{9}');
+        this.phoneInput.setAttribute('title', _t('Enter a valid 9-digit phone number'));
+
+        this.phoneInput.addEventListener('change', this._onPhoneChange.bind(this));
+        this.methodSelect.addEventListener('change', this._onMethodChange.bind(this));
+        // Captured before the checkout form handles the click, which would
+        // otherwise start a redirect flow
+        this.form.addEventListener('click', this._onClickPay.bind(this), true);
+        this.form.addEventListener('change', this._onChangePaymentOption.bind(this));
+        // Markup of the Pay buttons of the checkout form before SmobilPay changed it
+        this.savedButtons = new Map();
+
+        // A saved number pre-filled the form: it can be submitted right away
+        if (this.phoneInput.value && this.methodSelect.value) {
+            this._onMethodChange();
+        }
+    }
+
+    get submitButtons() {
+        return this.form.querySelectorAll(SUBMIT_SELECTOR);
+    }
 
     /**
-     * SmobilPay Payment Form Widget
+     * Tell whether SmobilPay is the payment option selected in the checkout form
      */
-    publicWidget.registry.SmobilpayPaymentForm = publicWidget.Widget.extend({
-        selector: '.smobilpay-payment-form',
-        events: {
-            'change #smobilpay_phone': '_onPhoneChange',
-            'change #smobilpay_method': '_onMethodChange',
-            'submit': '_onSubmit',
-        },
-
-        start: function () {
-            this._super.apply(this, arguments);
-            this._setupValidation();
-            return Promise.resolve();
-        },
-
-        /**
-         * Setup form validation
-         */
-        _setupValidation: function () {
-            this.phoneInput = this.$('#smobilpay_phone');
-            this.methodSelect = this.$('#smobilpay_method');
-            
-            // Add validation attributes
-            this.phoneInput.attr('pattern', '[0-9]{9}');
-            this.phoneInput.attr('title', 'Enter a valid 9-digit phone number');
-        },
-
-        /**
-         * Handle phone number input changes
-         */
-        _onPhoneChange: function (ev) {
-            const phone = $(ev.currentTarget).val();
-            const isValid = this._validatePhone(phone);
-            
-            if (phone && !isValid) {
-                this._showFieldError($(ev.currentTarget), _t('Please enter a valid phone number (9 digits)'));
-            } else {
-                this._clearFieldError($(ev.currentTarget));
-            }
-            
-            this._updateSubmitButton();
-        },
-
-        /**
-         * Handle payment method selection changes  
-         */
-        _onMethodChange: function (ev) {
-            const method = $(ev.currentTarget).val();
-            
-            if (method) {
-                this._clearFieldError($(ev.currentTarget));
-                this._updatePaymentMethodInfo(method);
-            }
-            
+    _isSelected() {
+        if (this.form === this.el) {
+            return true;
+        }
+        const radio = this.form.querySelector('input[name="o_payment_radio"]:checked');
+        return Boolean(radio)
+            && radio.dataset.paymentOptionType === 'provider'
+            && radio.dataset.paymentOptionId === this.el.dataset.providerId;
+    }
+
+    /**
+     * Handle phone number input changes
+     */
+    _onPhoneChange() {
+        const phone = this.phoneInput.value;
+        if (phone && !validatePhone(phone)) {
+            showFieldError(this.phoneInput, _t('Please enter a valid phone number (9 digits)'));
+        } else {
+            clearFieldError(this.phoneInput);
+        }
+        this._updateSubmitButton();
+    }
+
+    /**
+     * Handle payment method selection changes
+     */
+    _onMethodChange() {
+        const info = METHOD_INFO[this.methodSelect.value];
+        if (info) {
+            clearFieldError(this.methodSelect);
+            this.phoneInput.setAttribute('placeholder', `Enter ${info.prefix} number`);
+            this.phoneInput.setAttribute('title', `Valid prefixes for ${info.name}: ${info.prefix}`);
+        }
+        this._updateSubmitButton();
+    }
+
+    /**
+     * Give the Pay buttons back to the checkout form when another option is selected
+     */
+    _onChangePaymentOption(ev) {
+        if (ev.target.name !== 'o_payment_radio') {
+            return;
+        }
+        if (this._isSelected()) {
             this._updateSubmitButton();
-        },
-
-        /**
-         * Handle form submission
-         */
-        _onSubmit: function (ev) {
-            ev.preventDefault();
-            
-            const phone = this.phoneInput.val();
-            const method = this.methodSelect.val();
-            
-            if (!this._validateForm(phone, method)) {
-                return false;
-            }
-            
-            this._showLoadingState();
-            this._createPaymentRequest(phone, method);
-        },
-
-        /**
-         * Validate phone number format
-         */
-        _validatePhone: function (phone) {
-            // Remove spaces and special characters
-            const cleanPhone = phone.replace(/[\s\-\(\)]/g, '');
-            
-            // Check if it's a valid Cameroon phone number (9 digits)
-            return /^[0-9]{9}$/.test(cleanPhone);
-        },
-
-        /**
-         * Validate entire form
-         */
-        _validateForm: function (phone, method) {
-            let isValid = true;
-            
-            // Validate phone number
-            if (!phone || !this._validatePhone(phone)) {
-                this._showFieldError(this.phoneInput, _t('Please enter a valid phone number'));
-                isValid = false;
-            }
-            
-            // Validate payment method
-            if (!method) {
-                this._showFieldError(this.methodSelect, _t('Please select a payment method'));
-                isValid = false;
-            }
-            
-            return isValid;
-        },
-
-        /**
-         * Show field-specific error
-         */
-        _showFieldError: function ($field, message) {
-            $field.addClass('smobilpay-error');
-            
-            // Remove existing error message
-            $field.parent().find('.smobilpay-error-message').remove();
-            
-            // Add new error message
-            $field.parent().append(
-                $('<div class="smobilpay-error-message">').text(message)
-            );
-        },
-
-        /**
-         * Clear field error
-         */
-        _clearFieldError: function ($field) {
-            $field.removeClass('smobilpay-error');
-            $field.parent().find('.smobilpay-error-message').remove();
-        },
-
-        /**
-         * Update payment method information
-         */
-        _updatePaymentMethodInfo: function (method) {
-            const methodInfo = {
-                'mtn_cm': {
-                    name: 'MTN Mobile Money',
-                    prefix: '67, 68',
-                    color: '#FFD700'
-                },
-                'orange_cm': {
-                    name: 'Orange Mobile Money', 
-                    prefix: '69, 65',
-                    color: '#FF8C00'
-                },
-                'express_union': {
-                    name: 'Express Union',
-                    prefix: '67, 68, 69',
-                    color: '#4169E1'
-                },
-                'smobilpay_cash': {
-                    name: 'SmobilPay Cash',
-                    prefix: 'Any number',
-                    color: '#32CD32'
-                }
-            };
-            
-            const info = methodInfo[method];
-            if (info) {
-                this.phoneInput.attr('placeholder', `Enter ${info.prefix} number`);
-                this.phoneInput.attr('title', `Valid prefixes for ${info.name}: ${info.prefix}`);
-            }
-        },
-
-        /**
-         * Update submit button state
-         */
-        _updateSubmitButton: function () {
-            const phone = this.phoneInput.val();
-            const method = this.methodSelect.val();
-            const isFormValid = this._validatePhone(phone) && method;
-            
-            const $submitBtn = this.$('button[type="submit"], input[type="submit"]');
-            $submitBtn.prop('disabled', !isFormValid);
-            
-            if (isFormValid) {
-                $submitBtn.removeClass('btn-secondary').addClass('btn-success');
-                $submitBtn.text(_t('Pay with Mobile Money'));
-            } else {
-                $submitBtn.removeClass('btn-success').addClass('btn-secondary');
-                $submitBtn.text(_t('Complete form to continue'));
+        } else {
+            this._restoreSubmitButtons();
+        }
+    }
+
+    /**
+     * Remember the markup of the Pay buttons before SmobilPay changes it
+     */
+    _saveSubmitButtons() {
+        for (const button of this.submitButtons) {
+            if (!this.savedButtons.has(button)) {
+                this.savedButtons.set(button, { html: button.innerHTML, className: button.className });
             }
-        },
-
-        /**
-         * Show loading state during payment processing
-         */
-        _showLoadingState: function () {
-            this.$el.addClass('smobilpay-loading');
-            
-            const $submitBtn = this.$('button[type="submit"], input[type="submit"]');
-            $submitBtn.prop('disabled', true);
-            $submitBtn.html('<i class="fa fa-spinner fa-spin"></i> ' + _t('Processing...'));
-        },
-
-        /**
-         * Create payment request with SmobilPay
-         */
-        _createPaymentRequest: function (phone, method) {
-            const paymentData = {
-                phone: phone,
-                method: method,
-                merchant_reference: this.$('input[name="merchant_reference"]').val(),
-                amount: this.$('input[name="amount"]').val(),
-                currency: this.$('input[name="currency"]').val(),
-            };
-            
-            // Make AJAX request to create payment
-            $.ajax({
-                url: '/payment/smobilpay/create',
+        }
+    }
+
+    /**
+     * Restore the markup of the Pay buttons; their state is left to the checkout form
+     */
+    _restoreSubmitButtons() {
+        for (const [button, saved] of this.savedButtons) {
+            button.innerHTML = saved.html;
+            button.className = saved.className;
+        }
+        this.savedButtons.clear();
+    }
+
+    /**
+     * Handle the Pay button while SmobilPay is selected
+     */
+    _onClickPay(ev) {
+        if (!ev.target.closest(SUBMIT_SELECTOR) || !this._isSelected()) {
+            return;
+        }
+        ev.stopPropagation();
+        this._onSubmit(ev);
+    }
+
+    /**
+     * Handle form submission
+     */
+    _onSubmit(ev) {
+        ev.preventDefault();
+
+        const phone = this.phoneInput.value;
+        const method = this.methodSelect.value;
+        if (!this._validateForm(phone, method)) {
+            return;
+        }
+
+        this._showLoadingState();
+        this._createPaymentRequest(phone, method);
+    }
+
+    /**
+     * Validate entire form
+     */
+    _validateForm(phone, method) {
+        let isValid = true;
+        if (!validatePhone(phone)) {
+            showFieldError(this.phoneInput, _t('Please enter a valid phone number'));
+            isValid = false;
+        }
+        if (!method) {
+            showFieldError(this.methodSelect, _t('Please select a payment method'));
+            isValid = false;
+        }
+        return isValid;
+    }
+
+    /**
+     * Update submit button state
+     */
+    _updateSubmitButton() {
+        if (!this._isSelected()) {
+            return;
+        }
+        const isFormValid = validatePhone(this.phoneInput.value) && this.methodSelect.value;
+        this._saveSubmitButtons();
+        for (const button of this.submitButtons) {
+            button.disabled = !isFormValid;
+            button.classList.toggle('btn-success', Boolean(isFormValid));
+            button.classList.toggle('btn-secondary', !isFormValid);
+            button.textContent = isFormValid
+                ? _t('Pay with Mobile Money')
+                : _t('Complete form to continue');
+        }
+    }
+
+    /**
+     * Show loading state during payment processing
+     */
+    _showLoadingState() {
+        this.el.classList.add('smobilpay-loading');
+        this._saveSubmitButtons();
+        for (const button of this.submitButtons) {
+            button.disabled = true;
+            button.innerHTML = `<i class="fa fa-spinner fa-spin"></i> ${_t('Processing...')}`;
+        }
+    }
+
+    /**
+     * Create payment request with SmobilPay
+     */
+    async _createPaymentRequest(phone, method) {
+        let merchantReference;
+        try {
+            merchantReference = await this._getMerchantReference();
+        } catch (error) {
+            // Only the errors raised by the transaction route carry a message for the customer
+            this._onPaymentRequestError(error.constructor === Error ? error.message : '');
+            return;
+        }
+        const body = new URLSearchParams({
+            phone: phone,
+            method: method,
+            merchant_reference: merchantReference,
+        });
+
+        let response;
+        try {
+            const httpResponse = await fetch('/payment/smobilpay/create', {
                 method: 'POST',
-                data: paymentData,
-                dataType: 'json',
-                success: this._onPaymentRequestSuccess.bind(this),
-                error: this._onPaymentRequestError.bind(this)
-            });
-        },
-
-        /**
-         * Handle successful payment request creation
-         */
-        _onPaymentRequestSuccess: function (response) {
-            if (response.status === 'success' && response.payment_url) {
-                // Redirect to SmobilPay payment page
-                window.location.href = response.payment_url;
-            } else {
-                this._onPaymentRequestError({
-                    responseJSON: {
-                        error: response.message || _t('Failed to create payment request')
-                    }
-                });
-            }
-        },
-
-        /**
-         * Handle payment request errors
-         */
-        _onPaymentRequestError: function (xhr) {
-            this.$el.removeClass('smobilpay-loading');
-            
-            const errorMessage = xhr.responseJSON && xhr.responseJSON.error 
-                ? xhr.responseJSON.error 
-                : _t('Payment request failed. Please try again.');
-                
-            // Show error dialog
-            Dialog.alert(this, errorMessage, {
-                title: _t('Payment Error'),
-                confirm_callback: () => {
-                    // Reset form
-                    const $submitBtn = this.$('button[type="submit"], input[type="submit"]');
-                    $submitBtn.prop('disabled', false);
-                    $submitBtn.text(_t('Pay with Mobile Money'));
-                }
+                body: body,
+                headers: { Accept: 'application/json' },
             });
+            response = await httpResponse.json();
+        } catch {
+            response = {};
+        }
+
+        if (response.status === 'success' && response.payment_url) {
+            // Redirect to SmobilPay payment page
+            window.location.href = response.payment_url;
+        } else if (response.status === 'queued') {
+            // SmobilPay is unreachable: the status page waits for the queued request
+            window.location.href = response.redirect_url;
+        } else {
+            this._onPaymentRequestError(response.error || response.message);
         }
-    });
+    }
 
     /**
-     * Payment Status Page Widget
+     * Return the merchant reference of the transaction being paid
+     *
+     * The checkout form is rendered before any transaction exists: the first
+     * submission creates it through the transaction route of the form, as the
+     * payment module does, and keeps its reference so that submitting again
+     * reuses the same transaction.
      */
-    publicWidget.registry.SmobilpayPaymentStatus = publicWidget.Widget.extend({
-        selector: '.payment-status-container',
-
-        start: function () {
-            this._super.apply(this, arguments);
-            this._checkPaymentStatus();
-            return Promise.resolve();
-        },
-
-        /**
-         * Periodically check payment status for pending transactions
-         */
-        _checkPaymentStatus: function () {
-            const $alert = this.$('.alert-warning');
-            if ($alert.length > 0) {
-                // Payment is pending, check status every 5 seconds
-                setTimeout(() => {
-                    window.location.reload();
-                }, 5000);
-            }
+    async _getMerchantReference() {
+        const input = this.el.querySelector('input[name="merchant_reference"]');
+        if (input.value) {
+            return input.value;
+        }
+        const context = this.form.dataset;
+        const httpResponse = await fetch(context.transactionRoute, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', Accept: 'application/json' },
+            body: JSON.stringify({
+                jsonrpc: '2.0',
+                method: 'call',
+                params: {
+                    payment_option_id: parseInt(this.el.dataset.providerId),
+                    reference_prefix: context.referencePrefix || null,
+                    amount: context.amount ? parseFloat(context.amount) : null,
+                    currency_id: context.currencyId ? parseInt(context.currencyId) : null,
+                    partner_id: parseInt(context.partnerId),
+                    flow: 'direct',
+                    tokenization_requested: false,
+                    landing_route: context.landingRoute,
+                    is_validation: false,
+                    access_token: context.accessToken || null,
+                },
+            }),
+        });
+        const { result, error } = await httpResponse.json();
+        if (error) {
+            // The message of a JSON-RPC error is meant for the customer
+            throw new Error((error.data && error.data.message) || '');
         }
-    });
+        input.value = result.smobilpay_merchant_reference;
+        return input.value;
+    }
 
-    return {
-        SmobilpayPaymentForm: publicWidget.registry.SmobilpayPaymentForm,
-        SmobilpayPaymentStatus: publicWidget.registry.SmobilpayPaymentStatus,
-    };
-});
\ No newline at end of file
+    /**
+     * Handle payment request errors
+     */
+    _onPaymentRequestError(message) {
+        this.el.classList.remove('smobilpay-loading');
+
+        let alert = this.el.querySelector('.smobilpay-request-error');
+        if (!alert) {
+            alert = document.createElement('div');
+            alert.className = 'alert alert-danger smobilpay-request-error';
+            alert.setAttribute('role', 'alert');
+            this.el.prepend(alert);
+        }
+        alert.textContent = message || _t('Payment request failed. Please try again.');
+
+        // Reset form
+        this._updateSubmitButton();
+    }
+}
+
+/**
+ * Attach the SmobilPay form widget to the matching elements under `root`
+ */
+export function mountAll(root = document) {
+    for (const el of root.querySelectorAll(SmobilpayPaymentForm.selector)) {
+        if (!el.dataset.smobilpayMounted) {
+            el.dataset.smobilpayMounted = '1';
+            new SmobilpayPaymentForm(el);
+        }
+    }
+}
@@ -0,0 +1,6 @@
+/** @odoo-module **/
+
+import { mountAll } from "@smobilpay_odoo_gateway/js/payment_form";
+
+// Runs once, when the lazy SmobilPay bundle is loaded
+mountAll();
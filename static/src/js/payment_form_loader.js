@@ -0,0 +1,23 @@
+/** @odoo-module **/
+
+import { getBundle, loadBundle } from "@web/core/assets";
+
+const BUNDLE = 'smobilpay_odoo_gateway.assets_payment_form';
+const SELECTOR = '.smobilpay-payment-form';
+
+/**
+ * Fetch the SmobilPay form assets only on pages that display a SmobilPay form,
+ * instead of shipping them in every frontend page.
+ */
+async function loadSmobilpayAssets() {
+    if (!document.querySelector(SELECTOR)) {
+        return;
+    }
+    await loadBundle(await getBundle(BUNDLE));
+}
+
+if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', loadSmobilpayAssets);
+} else {
+    loadSmobilpayAssets();
+}
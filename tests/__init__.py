@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+
+from . import test_notification_queries
+from . import test_rate_limit
+from . import test_dead_letter
+from . import test_velocity
+from . import test_webhook_secret_rotation
+from . import test_outbox
+from . import test_idempotency
+from . import test_latency_sketch
+from . import test_replica
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmark of the parsing of SmobilPay notifications
+
+Compares `SmobilpayNotification.parse` followed by `get_tx_values` with the
+mapping code `_process_notification_data` ran before it, which rebuilt its
+mapping dicts on every call but neither type-checked the payload nor
+normalised phone numbers, and with that legacy code doing the same checks
+and normalisation as the parser. The parser is measured with the cache of
+normalised phone numbers warm, as for the repeated notifications of a
+payment, and cold, as for the first notification of a number. Only the
+pure-Python part is measured; the queries saved by writing the fields at
+once are pinned by `test_notification_queries`.
+
+Run it with the addons path of the server:
+
+    python3 tests/bench_notification.py --addons-path=/path/to/odoo/addons,/path/to/custom/addons
+"""
+
+import argparse
+import timeit
+
+PAYLOADS = [
+    {
+        'merchantReference': '9b2c1f6e-2f1a-4f0e-9d7a-3b1e2c4d5f6a',
+        'status': 'CONFIRMED',
+        'paymentId': 'SP-1029384756',
+        'statusMessage': "Payment confirmed",
+        'phoneNumber': '237677123456',
+        'paymentMethod': 'MTN_CM',
+    },
+    {
+        'merchantReference': '0f4e5d6c-7b8a-4c9d-8e1f-2a3b4c5d6e7f',
+        'status': 'in_progress',
+        'paymentId': 'SP-5647382910',
+        'phoneNumber': '+237 699 12 34 56',
+        'paymentMethod': 'orange_cm',
+    },
+    {
+        'merchantReference': '7a6b5c4d-3e2f-4a1b-9c8d-7e6f5a4b3c2d',
+        'status': 'FAILED',
+        'statusMessage': "Insufficient balance",
+    },
+]
+
+
+def legacy_tx_values(notification_data):
+    """The mapping done by `_process_notification_data` before `SmobilpayNotification`"""
+    values = {'smobilpay_payment_id': notification_data.get('paymentId', '')}
+    status = notification_data.get('status', '').upper()
+    status_mapping = {
+        'CREATED': 'pending',
+        'INITIALISED': 'pending',
+        'IN_PROGRESS': 'pending',
+        'CONFIRMED': 'done',
+        'FAILED': 'error',
+        'CANCELED': 'cancel',
+        'CANCELLED': 'cancel',
+    }
+    new_state = status_mapping.get(status, 'pending')
+    values['smobilpay_status_details'] = notification_data.get('statusMessage', '')
+    if notification_data.get('phoneNumber'):
+        values['smobilpay_phone_number'] = notification_data['phoneNumber']
+    if notification_data.get('paymentMethod'):
+        method_mapping = {
+            'MTN_CM': 'mtn_cm',
+            'ORANGE_CM': 'orange_cm',
+            'EXPRESS_UNION': 'express_union',
+            'SMOBILPAY_CASH': 'smobilpay_cash',
+        }
+        values['smobilpay_payment_method'] = method_mapping.get(
+            notification_data['paymentMethod'].upper(), 'mtn_cm'
+        )
+    return new_state, values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--addons-path', help="Addons path of the Odoo server")
+    parser.add_argument('--number', type=int, default=200000, help="Notifications parsed per run")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs, the fastest one being kept")
+    args = parser.parse_args()
+
+    if args.addons_path:
+        from odoo.modules.module import initialize_sys_path
+        from odoo.tools import config
+        config.parse_config([f'--addons-path={args.addons_path}'])
+        initialize_sys_path()
+    from odoo.addons.smobilpay_odoo_gateway import const, utils
+    from odoo.addons.smobilpay_odoo_gateway.notification import SmobilpayNotification
+
+    normalize_phone = utils.normalize_phone.__wrapped__
+
+    def legacy_validated_tx_values(notification_data):
+        """The legacy mapping, with the checks and normalisation of the parser"""
+        for key in const.NOTIFICATION_FIELDS:
+            value = notification_data.get(key)
+            if value and type(value) is not str and not (key == 'paymentId' and type(value) is int):
+                raise ValueError(key)
+        new_state, values = legacy_tx_values(notification_data)
+        phone = values.get('smobilpay_phone_number')
+        if phone:
+            values['smobilpay_phone_number'] = normalize_phone(phone) or phone
+        return new_state, values
+
+    def run_legacy():
+        for payload in PAYLOADS:
+            legacy_tx_values(payload)
+
+    def run_legacy_validated():
+        for payload in PAYLOADS:
+            legacy_validated_tx_values(payload)
+
+    def run_parse():
+        for payload in PAYLOADS:
+            notification = SmobilpayNotification.parse(payload)
+            notification.state, notification.get_tx_values()
+
+    def run_parse_cold():
+        utils.normalize_phone.cache_clear()
+        run_parse()
+
+    for label, function in (
+        ("before (dict rebuilding)", run_legacy),
+        ("before + same validation", run_legacy_validated),
+        ("SmobilpayNotification", run_parse),
+        ("SmobilpayNotification, cold", run_parse_cold),
+    ):
+        elapsed = min(timeit.repeat(function, number=args.number, repeat=args.repeat))
+        rate = args.number * len(PAYLOADS) / elapsed
+        print(f"{label:<28} {rate / 1e6:6.2f}M notifications/s  {1e9 / rate:6.0f} ns/notification")
+
+
+if __name__ == '__main__':
+    main()
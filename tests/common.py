@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+from unittest.mock import patch
+
+import requests
+
+from odoo.addons.payment.tests.common import PaymentCommon
+from odoo.addons.smobilpay_odoo_gateway import utils
+
+
+class SmobilpayCommon(PaymentCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.provider = cls._prepare_provider('smobilpay', update_values={
+            'smobilpay_consumer_key': 'consumer-key',
+            'smobilpay_consumer_secret': 'consumer-secret',
+        })
+
+    def setUp(self):
+        super().setUp()
+        # The per-worker state of the provider outlives the test transaction
+        utils.reset_provider_state(self.provider)
+        self.addCleanup(utils.reset_provider_state, self.provider)
+
+    def _enter_registry_test_mode(self):
+        """Run the queries made on new cursors in the test transaction"""
+        self.registry.enter_test_mode(self.cr)
+        self.addCleanup(self.registry.leave_test_mode)
+
+    def _create_smobilpay_transaction(self, merchant_reference, **values):
+        tx = self._create_transaction(
+            'direct',
+            reference=f'SP-{merchant_reference}',
+            smobilpay_merchant_reference=merchant_reference,
+            **dict({'state': 'pending'}, **values),
+        )
+        self.env.flush_all()
+        return tx
+
+    def _get_notification(self, merchant_reference, status='CONFIRMED'):
+        return {
+            'merchantReference': merchant_reference,
+            'status': status,
+            'paymentId': f'SP-PAY-{merchant_reference}',
+            'phoneNumber': '237677123456',
+            'paymentMethod': 'MTN_CM',
+        }
+
+    def _patch_api(self):
+        """Answer the SmobilPay API calls with a created order while
+        `self.api_available` is set, and fail them as an unreachable API
+        otherwise
+
+        :return: The mock of `_smobilpay_make_request`
+        """
+        self.api_available = True
+
+        def make_request(provider, endpoint, data=None, method='GET', lane='checkout'):
+            if not self.api_available:
+                utils.get_provider_state(provider).record_failure("Connection refused")
+                raise requests.ConnectionError("Connection refused")
+            reference = data['merchantReference']
+            return {
+                'status': 'success',
+                'paymentUrl': f'https://pay.smobilpay.test/{reference}',
+                'paymentId': f'SP-PAY-{reference}',
+            }
+
+        patcher = patch.object(
+            type(self.env['payment.provider']), '_smobilpay_make_request',
+            autospec=True, side_effect=make_request,
+        )
+        self.addCleanup(patcher.stop)
+        return patcher.start()
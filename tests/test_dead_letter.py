@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+from datetime import datetime
+from unittest.mock import patch
+
+import psycopg2
+
+from odoo.exceptions import ValidationError
+from odoo.tests import tagged
+
+from odoo.addons.smobilpay_odoo_gateway.tests.common import SmobilpayCommon
+
+
+@tagged('post_install', '-at_install')
+class TestDeadLetter(SmobilpayCommon):
+
+    def _capture(self, notification_data, error):
+        return self.env['smobilpay.dead.letter'].sudo()._smobilpay_capture('webhook', notification_data, error)
+
+    def _run_retry_cron(self):
+        # NOW() is the start of the test transaction, before the dead letters were created
+        self.env['smobilpay.dead.letter'].search([]).write({'next_retry_date': datetime(2000, 1, 1)})
+        with patch.object(self.env.cr, 'commit', lambda: None):
+            self.env['smobilpay.dead.letter'].sudo()._cron_smobilpay_retry_dead_letters()
+
+    def test_lock_error_is_retried_until_processed(self):
+        tx = self._create_smobilpay_transaction('locked')
+        dead_letter = self._capture(
+            self._get_notification('locked'), psycopg2.OperationalError("could not obtain lock")
+        )
+        self.assertEqual(dead_letter.state, 'pending')
+        self.assertTrue(dead_letter.next_retry_date)
+
+        self._run_retry_cron()
+
+        self.assertEqual(dead_letter.state, 'done')
+        self.assertEqual(dead_letter.transaction_id, tx)
+        self.assertEqual(tx.state, 'done')
+
+    def test_invalid_notification_is_abandoned_at_once(self):
+        dead_letter = self._capture({'status': 'CONFIRMED'}, ValidationError("Missing merchant reference"))
+        self.assertEqual(dead_letter.state, 'abandoned')
+        self.assertFalse(dead_letter.next_retry_date)
+
+    def test_unknown_reference_is_abandoned_on_first_retry(self):
+        dead_letter = self._capture(
+            self._get_notification('unknown'), psycopg2.OperationalError("could not obtain lock")
+        )
+
+        self._run_retry_cron()
+
+        self.assertEqual(dead_letter.state, 'abandoned')
+        self.assertEqual(dead_letter.attempt_count, 2)
+        self.assertEqual(dead_letter.error_class, 'ValidationError')
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+from datetime import datetime
+
+from odoo.tests import tagged
+
+from odoo.addons.smobilpay_odoo_gateway.tests.common import SmobilpayCommon
+
+
+@tagged('post_install', '-at_install')
+class TestIdempotency(SmobilpayCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.api = self._patch_api()
+        self.tx = self._create_smobilpay_transaction('idempotent', state='draft')
+
+    def test_retry_reuses_the_created_order(self):
+        payment_url = self.tx._smobilpay_create_payment_request()
+        self.assertEqual(payment_url, 'https://pay.smobilpay.test/idempotent')
+        self.assertEqual(self.tx._smobilpay_create_payment_request(), payment_url)
+        self.assertEqual(self.api.call_count, 1, "The retry must not create a second order")
+
+    def test_expired_key_creates_the_order_again(self):
+        self.tx._smobilpay_create_payment_request()
+        self.env['smobilpay.idempotency'].search([('key', '=', 'idempotent')]).write({
+            'expires_at': datetime(2000, 1, 1),
+        })
+        self.tx._smobilpay_create_payment_request()
+        self.assertEqual(self.api.call_count, 2)
+
+    def test_keys_are_per_provider(self):
+        self.tx._smobilpay_create_payment_request()
+        other_provider = self.provider.copy({'name': "SmobilPay (other company)"})
+        other_tx = self._create_smobilpay_transaction(
+            'idempotent-other', state='draft', provider_id=other_provider.id
+        )
+        other_tx.smobilpay_merchant_reference = 'idempotent'
+        other_tx._smobilpay_create_payment_request()
+        self.assertEqual(self.api.call_count, 2)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+import random
+from datetime import timedelta
+
+from odoo.tests import tagged
+
+from odoo.addons.smobilpay_odoo_gateway import const
+from odoo.addons.smobilpay_odoo_gateway.sketch import LatencySketch
+from odoo.addons.smobilpay_odoo_gateway.tests.common import SmobilpayCommon
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+@tagged('post_install', '-at_install')
+class TestLatencySketch(SmobilpayCommon):
+
+    def setUp(self):
+        super().setUp()
+        # Long-tailed latencies, up to a few hours
+        rng = random.Random(42)
+        self.latencies = [rng.lognormvariate(3, 1.5) + 1 for _i in range(2000)]
+
+    def assertQuantilesAccurate(self, sketch, values):
+        values = sorted(values)
+        for q in QUANTILES:
+            expected = values[int(q * (len(values) - 1))]
+            self.assertAlmostEqual(
+                sketch.quantile(q), expected, delta=expected * const.LATENCY_SKETCH_ACCURACY,
+                msg=f"q{q} is out of the relative accuracy",
+            )
+
+    def test_quantiles_are_within_the_relative_accuracy(self):
+        sketch = LatencySketch()
+        for latency in self.latencies:
+            sketch.add(latency)
+        self.assertEqual(sketch.count, len(self.latencies))
+        self.assertQuantilesAccurate(sketch, self.latencies)
+
+    def test_merged_sketches_equal_the_sketch_of_all_values(self):
+        sketches = [LatencySketch() for _i in range(3)]
+        for index, latency in enumerate(self.latencies):
+            sketches[index % 3].add(latency)
+        merged = LatencySketch()
+        for sketch in sketches:
+            merged.merge(sketch)
+
+        combined = LatencySketch()
+        for latency in self.latencies:
+            combined.add(latency)
+        self.assertEqual(merged.buckets, combined.buckets)
+
+    def test_hourly_sketches_are_merged_over_the_period(self):
+        tx = self._create_smobilpay_transaction('latency', smobilpay_payment_method='mtn_cm')
+        # The confirmations are spread over the 3 hours following the creation
+        latencies = [latency + 3600 * (index % 3) for index, latency in enumerate(self.latencies[:200])]
+        for latency in latencies:
+            tx.last_state_change = tx.create_date + timedelta(seconds=latency)
+            self.env['smobilpay.latency.sketch']._smobilpay_record(tx)
+        hours = self.env['smobilpay.latency.sketch'].search([('provider_id', '=', self.provider.id)]).mapped('hour')
+        self.assertGreater(len(set(hours)), 1)
+
+        stats = self.env['smobilpay.latency.sketch']._smobilpay_get_sketches(
+            tx.create_date - timedelta(hours=1), provider_ids=self.provider.ids
+        )
+        sketch = stats[self.provider.id, 'mtn_cm']
+        self.assertEqual(sketch.count, len(latencies))
+        self.assertQuantilesAccurate(sketch, latencies)
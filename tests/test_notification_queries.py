@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+import re
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from odoo.addons.smobilpay_odoo_gateway.tests.common import SmobilpayCommon
+
+TX_UPDATE_PATTERN = re.compile(r'\s*UPDATE\s+"?payment_transaction"?\s', re.IGNORECASE)
+
+
+@tagged('post_install', '-at_install')
+class TestNotificationQueries(SmobilpayCommon):
+
+    def _warm_up(self):
+        """Process a first notification so the ORM caches are filled"""
+        tx = self._create_smobilpay_transaction('warm-up')
+        tx._handle_notification_data('smobilpay', self._get_notification('warm-up'))
+        self.env.flush_all()
+        self.env.invalidate_all()
+
+    @contextmanager
+    def _capture_tx_updates(self):
+        """Collect the UPDATE queries run on payment_transaction"""
+        updates = []
+        execute = self.env.cr.execute
+
+        def capturing_execute(query, *args, **kwargs):
+            if TX_UPDATE_PATTERN.match(str(query)):
+                updates.append(str(query))
+            return execute(query, *args, **kwargs)
+
+        with patch.object(self.env.cr, 'execute', capturing_execute):
+            yield updates
+
+    def test_confirmation_is_written_in_one_update(self):
+        self._warm_up()
+        tx = self._create_smobilpay_transaction('confirmed')
+        self.env.invalidate_all()
+
+        # Reads of the transaction, its provider, currency and linked orders and
+        # invoices, the velocity counter, latency sketch and saved number
+        # upserts, the UPDATE of the transaction and the bus notification
+        with self._capture_tx_updates() as updates, self.assertQueryCount(12):
+            tx._handle_notification_data('smobilpay', self._get_notification('confirmed'))
+
+        self.assertEqual(tx.state, 'done')
+        self.assertEqual(tx.smobilpay_phone_number, '+237677123456')
+        self.assertEqual(
+            len(updates), 1,
+            "The notification fields and the state change should be written in a single UPDATE",
+        )
+
+    def test_repeated_notification_writes_nothing(self):
+        tx = self._create_smobilpay_transaction('repeated')
+        notification = self._get_notification('repeated', status='IN_PROGRESS')
+        tx._handle_notification_data('smobilpay', notification)
+        self.env.flush_all()
+        self.env.invalidate_all()
+
+        with self._capture_tx_updates() as updates:
+            tx._handle_notification_data('smobilpay', notification)
+            self.env.flush_all()
+
+        self.assertEqual(tx.state, 'pending')
+        self.assertFalse(updates, "An unchanged notification should not update the transaction")
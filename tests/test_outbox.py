@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+from datetime import datetime
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from odoo.addons.smobilpay_odoo_gateway.tests.common import SmobilpayCommon
+
+
+@tagged('post_install', '-at_install')
+class TestOutbox(SmobilpayCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.provider.smobilpay_store_and_forward = True
+        self.api = self._patch_api()
+        self.tx = self._create_smobilpay_transaction('outbox', state='draft')
+
+    def _queue(self):
+        self.api_available = False
+        self.assertIsNone(self.tx._smobilpay_create_payment_request())
+        return self.env['smobilpay.outbox'].search([('transaction_id', '=', self.tx.id)])
+
+    def _run_drain_cron(self):
+        with patch.object(self.env.cr, 'commit', lambda: None):
+            self.env['smobilpay.outbox'].sudo()._cron_smobilpay_drain_outbox()
+
+    def test_request_is_queued_then_forwarded_to_the_customer(self):
+        item = self._queue()
+        self.assertEqual(item.state, 'queued')
+        self.assertEqual(self.tx.state, 'pending')
+        self.assertTrue(self.tx.smobilpay_queued)
+        values = self.tx._get_post_processing_values()
+        self.assertNotIn('smobilpay_payment_url', values)
+
+        self.api_available = True
+        self._run_drain_cron()
+
+        self.assertEqual(item.state, 'sent')
+        self.assertEqual(self.api.call_args.kwargs['lane'], 'background')
+        self.tx.invalidate_recordset(['smobilpay_queued'])
+        self.assertFalse(self.tx.smobilpay_queued)
+        payment_url = 'https://pay.smobilpay.test/outbox'
+        self.assertEqual(self.tx.smobilpay_payment_url, payment_url)
+        values = self.tx._get_post_processing_values()
+        self.assertEqual(values['smobilpay_payment_url'], payment_url)
+        self.assertIn(payment_url, values['display_message'], "The status page links to the payment page")
+
+    def test_request_stays_queued_while_the_api_is_unreachable(self):
+        item = self._queue()
+        self._run_drain_cron()
+        self.assertEqual(item.state, 'queued')
+        self.assertEqual(item.attempt_count, 1)
+        self.assertEqual(self.tx.state, 'pending')
+
+    def test_old_request_is_discarded(self):
+        item = self._queue()
+        item.queued_date = datetime(2000, 1, 1)
+        self.api_available = True
+        self._run_drain_cron()
+        self.assertEqual(item.state, 'expired')
+        self.assertEqual(self.tx.state, 'error')
+        self.assertFalse(self.tx.smobilpay_payment_url)
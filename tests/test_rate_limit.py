@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import tagged
+
+from odoo.addons.smobilpay_odoo_gateway import rate_limit
+from odoo.addons.smobilpay_odoo_gateway.tests.common import SmobilpayCommon
+
+
+@tagged('post_install', '-at_install')
+class TestRateLimit(SmobilpayCommon):
+
+    def setUp(self):
+        super().setUp()
+        self._enter_registry_test_mode()
+
+    def _get_limiter(self, rate, burst):
+        self.provider.write({'smobilpay_rate_limit': rate, 'smobilpay_rate_burst': burst})
+        return rate_limit.RateLimiter(self.provider)
+
+    def test_background_lane_leaves_tokens_to_checkout(self):
+        # A rate low enough for the bucket not to refill during the test
+        limiter = self._get_limiter(0.001, 4)
+        self.assertEqual(limiter.try_acquire('background'), 0)
+        self.assertEqual(limiter.try_acquire('background'), 0)
+        self.assertGreater(limiter.try_acquire('background'), 0, "Half of the bucket is kept for checkout")
+        self.assertEqual(limiter.try_acquire('checkout'), 0)
+        self.assertEqual(limiter.try_acquire('checkout'), 0)
+        self.assertGreater(limiter.try_acquire('checkout'), 0)
+
+    def test_background_lane_is_served_by_a_single_token_bucket(self):
+        limiter = self._get_limiter(0.001, 1)
+        self.assertEqual(limiter.try_acquire('background'), 0)
+
+    def test_retry_after_applies_to_all_calls_of_the_worker(self):
+        self._get_limiter(0, 1).block(30)
+        wait = rate_limit.RateLimiter(self.provider).try_acquire('checkout')
+        self.assertGreater(wait, 25, "A call made after a 429 waits even when rate limiting is disabled")
+
+    def test_parse_retry_after(self):
+        self.assertEqual(rate_limit.parse_retry_after('12'), 12)
+        self.assertEqual(rate_limit.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0)
+        self.assertEqual(rate_limit.parse_retry_after('soon'), rate_limit.const.RATE_LIMIT_DEFAULT_RETRY_AFTER)
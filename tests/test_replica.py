@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+from unittest.mock import patch
+
+from odoo import sql_db
+from odoo.tests import tagged
+from odoo.tools import config
+
+from odoo.addons.smobilpay_odoo_gateway import replica
+from odoo.addons.smobilpay_odoo_gateway.tests.common import SmobilpayCommon
+
+REPLICA_URI = 'postgresql://odoo_ro@replica.invalid:5432/'
+# Nothing listens on port 1: connecting is refused at once
+UNREACHABLE_URI = 'postgresql://odoo_ro@127.0.0.1:1/'
+
+
+@tagged('post_install', '-at_install')
+class TestReplica(SmobilpayCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.dbname = self.env.cr.dbname
+        patcher = patch.dict(replica._replica_lags, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _set_replica(self, uri):
+        patcher = patch.dict(config.options, {
+            'smobilpay_replica_uri': uri,
+            'smobilpay_replica_max_lag': 30,
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _patch_db_connect(self):
+        """Connect to the test database in place of the replica, on a connection of its own"""
+        db_connect = sql_db.db_connect
+        patcher = patch.object(
+            replica.sql_db, 'db_connect', side_effect=lambda uri, allow_uri=False: db_connect(self.dbname),
+        )
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def _get_backend_pid(self, cr):
+        cr.execute("SELECT pg_backend_pid()")
+        return cr.fetchone()[0]
+
+    def test_primary_is_used_without_replica(self):
+        self._set_replica(False)
+        with replica.cursor(self.dbname, fallback=self.env.cr) as cr:
+            self.assertIs(cr, self.env.cr)
+
+    def test_queries_are_routed_to_the_replica(self):
+        self._set_replica(REPLICA_URI)
+        db_connect = self._patch_db_connect()
+        with patch.object(replica, '_measure_lag', wraps=replica._measure_lag) as measure_lag:
+            for _i in range(2):
+                with replica.cursor(self.dbname, fallback=self.env.cr) as cr:
+                    self.assertIsNot(cr, self.env.cr)
+                    self.assertNotEqual(self._get_backend_pid(cr), self._get_backend_pid(self.env.cr))
+                    cr.execute("SHOW transaction_read_only")
+                    self.assertEqual(cr.fetchone()[0], 'on')
+        db_connect.assert_called_with(f'{REPLICA_URI}{self.dbname}', allow_uri=True)
+        self.assertEqual(measure_lag.call_count, 1, "The lag is measured once per check interval")
+
+    def test_lagging_replica_falls_back_to_the_primary(self):
+        self._set_replica(REPLICA_URI)
+        db_connect = self._patch_db_connect()
+        with patch.object(replica, '_measure_lag', return_value=3600):
+            for _i in range(2):
+                with replica.cursor(self.dbname, fallback=self.env.cr) as cr:
+                    self.assertIs(cr, self.env.cr)
+        self.assertEqual(db_connect.call_count, 1, "A lagging replica is not queried until the next check")
+
+    def test_unreachable_replica_falls_back_to_the_primary(self):
+        self._set_replica(UNREACHABLE_URI)
+        with replica.cursor(self.dbname, fallback=self.env.cr) as cr:
+            self.assertIs(cr, self.env.cr)
+
+        db_connect = self._patch_db_connect()
+        with replica.cursor(self.dbname) as cr:
+            self.assertIsNot(cr, self.env.cr)
+            cr.execute("SHOW transaction_read_only")
+            self.assertEqual(cr.fetchone()[0], 'on', "Without fallback, a read-only primary cursor is used")
+        db_connect.assert_not_called()
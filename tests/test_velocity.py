@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+from unittest.mock import Mock, patch
+
+from odoo.exceptions import ValidationError
+from odoo.tests import tagged
+
+from odoo.addons.smobilpay_odoo_gateway.tests.common import SmobilpayCommon
+
+PHONE = '+237677123456'
+IP_ADDRESS = '203.0.113.7'
+
+
+@tagged('post_install', '-at_install')
+class TestVelocity(SmobilpayCommon):
+
+    def setUp(self):
+        super().setUp()
+        # Customers behind the same carrier-grade NAT
+        request = Mock(httprequest=Mock(remote_addr=IP_ADDRESS))
+        patcher = patch('odoo.addons.smobilpay_odoo_gateway.models.payment_transaction.request', request)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tx = self._create_smobilpay_transaction('velocity')
+
+    def _attempt(self, key_type='phone', key=PHONE):
+        self.tx._smobilpay_count_attempt([(key_type, key)])
+        self.tx._smobilpay_check_velocity(phone=PHONE)
+
+    def test_limits_are_disabled_by_default(self):
+        self.assertFalse(self.provider._smobilpay_get_velocity_limits())
+        for _i in range(20):
+            self._attempt()
+
+    def test_phone_limit(self):
+        self.provider.smobilpay_velocity_max_attempts_phone = 2
+        self._attempt()
+        self._attempt()
+        with self.assertRaises(ValidationError):
+            self._attempt()
+
+    def test_amount_limit(self):
+        self.provider.smobilpay_velocity_max_amount_phone = self.tx.amount * 1.5
+        self._attempt()
+        with self.assertRaises(ValidationError):
+            self._attempt()
+
+    def test_shared_ip_address_is_not_limited_by_the_other_keys(self):
+        self.provider.write({
+            'smobilpay_velocity_max_attempts_phone': 5,
+            'smobilpay_velocity_max_attempts_partner': 5,
+        })
+        for _i in range(10):
+            self._attempt('ip', IP_ADDRESS)
+
+    def test_ip_limit(self):
+        self.provider.smobilpay_velocity_max_attempts_ip = 3
+        # The creation of the transaction counted the first attempt of the IP address
+        self._attempt('ip', IP_ADDRESS)
+        self._attempt('ip', IP_ADDRESS)
+        with self.assertRaises(ValidationError):
+            self._attempt('ip', IP_ADDRESS)
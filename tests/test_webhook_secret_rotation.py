@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+import json
+from datetime import datetime
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from odoo.addons.smobilpay_odoo_gateway import const, utils
+from odoo.addons.smobilpay_odoo_gateway.tests.common import SmobilpayCommon
+
+
+@tagged('post_install', '-at_install')
+class TestWebhookSecretRotation(SmobilpayCommon):
+
+    def setUp(self):
+        super().setUp()
+        # The match counts are saved from their own cursor
+        self._enter_registry_test_mode()
+        patcher = patch.object(const, 'WEBHOOK_MATCH_FLUSH_INTERVAL', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.provider.smobilpay_webhook_secret = 'old-secret'
+        self.provider.smobilpay_webhook_secret = 'new-secret'
+        self.tx = self._create_smobilpay_transaction('rotation')
+        self.payload = json.dumps(self._get_notification('rotation'))
+
+    def _verify(self, secret):
+        signature = utils.sign_webhook_payload(self.payload, secret)
+        return self.tx._smobilpay_verify_webhook_signature(self.payload, signature)
+
+    def test_replaced_secret_is_accepted_during_the_grace_period(self):
+        self.assertEqual(self.provider.smobilpay_webhook_secret_previous, 'old-secret')
+        self.assertTrue(self._verify('new-secret'))
+        self.assertTrue(self._verify('old-secret'))
+        self.assertFalse(self._verify('other-secret'))
+
+        self.assertEqual(self.provider.smobilpay_webhook_current_matches, 1)
+        self.assertEqual(self.provider.smobilpay_webhook_previous_matches, 1)
+        self.assertEqual(self.provider.smobilpay_webhook_invalid_count, 1)
+        self.assertTrue(self.provider.smobilpay_webhook_previous_last_match)
+
+    def test_replaced_secret_is_rejected_once_expired(self):
+        self.provider.smobilpay_webhook_secret_expiry = datetime(2000, 1, 1)
+        self.assertFalse(self._verify('old-secret'))
+        self.assertTrue(self._verify('new-secret'))
+
+    def test_replaced_secret_is_rejected_once_dropped(self):
+        self.provider.action_smobilpay_drop_previous_webhook_secret()
+        self.assertFalse(self._verify('old-secret'))
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+
+import functools
+import hashlib
+import hmac
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import odoo
+
+from odoo.addons.smobilpay_odoo_gateway import const
+
+_logger = logging.getLogger(__name__)
+
+# Per-worker state of each SmobilPay provider, keyed by (database, provider, company)
+_provider_states = {}
+_provider_states_lock = threading.Lock()
+
+# Databases whose providers were warmed up by this worker
+_warmed_up_dbnames = set()
+
+
+def _reset_worker_state():
+    _provider_states.clear()
+    _warmed_up_dbnames.clear()
+
+
+# Forked workers must not share the pooled sockets of their parent process,
+# and warm up their own
+os.register_at_fork(after_in_child=_reset_worker_state)
+
+
+class ProviderState:
+    """Token cache, connection pool and circuit breaker of one provider record
+
+    Each provider gets its own instance, so an outage or a rate limit on one
+    tenant's credentials never affects the calls made for another provider.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.token = None
+        self.token_expires_at = 0.0
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self.last_success_at = None
+        # Monotonic time until which SmobilPay asked the calls to wait (HTTP 429)
+        self.blocked_until = 0.0
+        self.webhook_matches = dict.fromkeys(('current', 'previous', 'invalid'), 0)
+        self.webhook_matches_flushed_at = 0.0
+        self._webhook_macs = ((), [])
+        self._session = None
+
+    @property
+    def session(self):
+        """Return the pooled HTTP session of the provider, creating it lazily"""
+        if self._session is None:
+            with self.lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=1, pool_maxsize=const.CONNECTION_POOL_SIZE
+                    )
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    # === TOKEN === #
+
+    def get_token(self):
+        """Return the cached access token if it is still valid"""
+        if self.token and time.monotonic() < self.token_expires_at:
+            return self.token
+        return None
+
+    def set_token(self, token, expires_in=None):
+        lifetime = int(expires_in or const.DEFAULT_TOKEN_LIFETIME)
+        self.token = token
+        self.token_expires_at = time.monotonic() + max(lifetime - const.TOKEN_EXPIRY_MARGIN, 0)
+
+    def clear_token(self):
+        self.token = None
+        self.token_expires_at = 0.0
+
+    # === CIRCUIT BREAKER === #
+
+    @property
+    def circuit_state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= const.CIRCUIT_RESET_TIMEOUT:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow_request(self):
+        """Tell whether a call may be sent upstream
+
+        Once the reset timeout has elapsed, a single probe is let through; the
+        circuit is re-opened right away so concurrent calls keep failing fast
+        until the probe reports its outcome.
+        """
+        with self.lock:
+            state = self.circuit_state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.last_success_at = time.time()
+
+    def is_failing(self, failures_before):
+        """Tell whether the API is unreachable: the circuit is not closed, or
+        calls failed since the failure count was `failures_before`
+        """
+        return self.circuit_state != self.CLOSED or self.failures > failures_before
+
+    def record_failure(self, error):
+        with self.lock:
+            self.failures += 1
+            self.last_error = error
+            if self.failures >= const.CIRCUIT_FAILURE_THRESHOLD:
+                self.opened_at = time.monotonic()
+
+    # === WEBHOOK SIGNATURES === #
+
+    def get_webhook_macs(self, secrets):
+        """Return the HMACs keyed with `secrets`, built once per set of secrets
+
+        The keys are encoded and the HMAC pads derived from them only when the
+        secrets change; verifying a signature then costs a `copy()`.
+
+        :param tuple secrets: The (label, secret) of the accepted secrets
+        :return: The (label, hmac) of the secrets; the HMACs must be copied
+                 before use
+        :rtype: list
+        """
+        cached_secrets, macs = self._webhook_macs
+        if cached_secrets != secrets:
+            macs = [
+                (label, hmac.new(secret.encode('utf-8'), digestmod=hashlib.sha256))
+                for label, secret in secrets
+            ]
+            self._webhook_macs = (secrets, macs)
+        return macs
+
+    def record_webhook_match(self, label):
+        """Count a webhook verified with the secret `label`
+
+        :param str label: 'current', 'previous' or 'invalid'
+        :return: The counts to save and reset if they are due, else None
+        :rtype: dict
+        """
+        with self.lock:
+            self.webhook_matches[label] += 1
+            now = time.monotonic()
+            if now - self.webhook_matches_flushed_at < const.WEBHOOK_MATCH_FLUSH_INTERVAL:
+                return None
+            matches = self.webhook_matches
+            self.webhook_matches = dict.fromkeys(matches, 0)
+            self.webhook_matches_flushed_at = now
+            return matches
+
+    def restore_webhook_matches(self, matches):
+        """Count again the webhook matches that could not be saved"""
+        with self.lock:
+            for label, count in matches.items():
+                self.webhook_matches[label] += count
+
+
+def get_provider_state(provider):
+    """Return the state of `provider`, creating it on first use
+
+    :param recordset provider: The provider, as a `payment.provider` record
+    :return: The state of the provider in the current worker
+    :rtype: ProviderState
+    """
+    key = (provider.env.cr.dbname, provider.id, provider.company_id.id)
+    state = _provider_states.get(key)
+    if state is None:
+        with _provider_states_lock:
+            state = _provider_states.setdefault(key, ProviderState())
+    return state
+
+
+def reset_provider_state(provider):
+    """Drop the cached token, connections and circuit of `provider`"""
+    key = (provider.env.cr.dbname, provider.id, provider.company_id.id)
+    with _provider_states_lock:
+        state = _provider_states.pop(key, None)
+    if state and state._session is not None:
+        state._session.close()
+
+
+def claim_warm_up(dbname):
+    """Tell whether this worker has yet to warm up the providers of `dbname`
+
+    Only the first call per database and worker returns True.
+    """
+    if dbname in _warmed_up_dbnames:
+        return False
+    with _provider_states_lock:
+        if dbname in _warmed_up_dbnames:
+            return False
+        _warmed_up_dbnames.add(dbname)
+    return True
+
+
+def sign_webhook_payload(payload, secret):
+    """Return the signature SmobilPay sends in the X-SmobilPay-Signature header
+
+    :param str payload: The raw webhook body
+    :param str secret: The webhook secret of the provider
+    :return: The hex-encoded HMAC-SHA256 of the payload
+    :rtype: str
+    """
+    return hmac.new(secret.encode('utf-8'), payload.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def install_pg_trgm(cr):
+    """Install the pg_trgm extension used by the trigram indexes of the module
+
+    Creating an extension may require privileges the Odoo user lacks: a
+    failure is logged and the indexes fall back to plain ones.
+
+    :return: Whether pg_trgm is installed
+    :rtype: bool
+    """
+    cr.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+    if cr.rowcount:
+        return True
+    try:
+        with cr.savepoint():
+            cr.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except Exception as e:
+        _logger.warning(
+            "SmobilPay: could not install pg_trgm (%s); ask a database administrator to run "
+            "'CREATE EXTENSION pg_trgm' and update the module again", e
+        )
+        return False
+    # The registry looked for pg_trgm before the module was loaded
+    odoo.registry(cr.dbname).has_trigram = True
+    return True
+
+
+@functools.lru_cache(maxsize=const.PHONE_CACHE_SIZE)
+def normalize_phone(phone):
+    """Return a Cameroon phone number in E.164 format (+237XXXXXXXXX)
+
+    Spaces, dashes and parentheses are ignored, and the country code may be
+    given as +237, 00237 or 237. Results are cached, as the callback, return
+    and webhook of a payment carry the same number.
+
+    :param str phone: The phone number as typed or received
+    :return: The normalised number, or None if it is not a valid number
+    :rtype: str
+    """
+    if not phone:
+        return None
+    # Numbers received as digits only, or already normalised, skip the regex
+    if phone.isdigit():
+        digits = phone
+    elif len(phone) == 13 and phone.startswith(const.PHONE_E164_PREFIX) and phone[1:].isdigit():
+        digits = phone[1:]
+    else:
+        digits = const.PHONE_STRIP_PATTERN.sub('', phone)
+        if digits.startswith('+'):
+            digits = digits[1:]
+    if digits.startswith('00'):
+        digits = digits[2:]
+    if len(digits) == 12 and digits.startswith(const.PHONE_COUNTRY_CODE):
+        digits = digits[len(const.PHONE_COUNTRY_CODE):]
+    if len(digits) != 9 or not (digits.isascii() and digits.isdigit()):
+        return None
+    return const.PHONE_E164_PREFIX + digits
+
+
+def get_phone_operator(phone):
+    """Return the mobile money operator of a phone number, from its prefix
+
+    :param str phone: The phone number, normalised or not
+    :return: The `smobilpay_payment_method` of the operator, or None if unknown
+    :rtype: str
+    """
+    phone = normalize_phone(phone)
+    if not phone:
+        return None
+    local = phone[-9:]
+    return const.PHONE_OPERATOR_PREFIXES.get(local[:3]) or const.PHONE_OPERATOR_PREFIXES.get(local[:2])
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+from werkzeug import urls
+
+from odoo import _, api, fields, models
+from odoo.exceptions import ValidationError
+
+
+class SmobilpayTransactionExport(models.TransientModel):
+    _name = 'smobilpay.transaction.export'
+    _description = "SmobilPay Transaction Export"
+
+    provider_id = fields.Many2one(
+        'payment.provider', string="Provider", domain=[('code', '=', 'smobilpay')],
+        help="Leave empty to export the transactions of all SmobilPay providers",
+    )
+    payment_method = fields.Selection(
+        string="Operator",
+        selection=lambda self: self.env['payment.transaction']._fields['smobilpay_payment_method'].selection,
+    )
+    state = fields.Selection(
+        string="Status",
+        selection=lambda self: self.env['payment.transaction']._fields['state'].selection,
+    )
+    date_from = fields.Date(string="From", help="Creation date (UTC), included")
+    date_to = fields.Date(string="To", help="Creation date (UTC), included")
+    file_format = fields.Selection(
+        string="Format",
+        selection=[('csv', "CSV"), ('xlsx', "Excel (XLSX)")],
+        default='csv',
+        required=True,
+    )
+
+    @api.constrains('date_from', 'date_to')
+    def _check_dates(self):
+        for export in self:
+            if export.date_from and export.date_to and export.date_from > export.date_to:
+                raise ValidationError(_("The start date must be before the end date."))
+
+    def action_export(self):
+        """Download the export, streamed by the `/payment/smobilpay/export` route"""
+        self.ensure_one()
+        params = {
+            'file_format': self.file_format,
+            'provider_id': self.provider_id.id or '',
+            'payment_method': self.payment_method or '',
+            'state': self.state or '',
+            'date_from': self.date_from and fields.Date.to_string(self.date_from) or '',
+            'date_to': self.date_to and fields.Date.to_string(self.date_to) or '',
+        }
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/payment/smobilpay/export?{urls.url_encode(params)}',
+            'target': 'self',
+        }